@@ -1,15 +1,41 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify, Response, stream_with_context, has_request_context, g
 import mysql.connector
-from mysql.connector import pooling
 from functools import wraps
 import os
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
 import secrets
+import hashlib
+import base64
+import json
+import re
+import math
+import threading
 import time
 import csv
 import io
+import cProfile
+import pstats
+import queue
+from contextlib import contextmanager, ExitStack
+import zlib
+import gzip
+import mimetypes
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import click
+import sys
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
 
 
 load_dotenv()
@@ -17,12 +43,233 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'you-should-definitely-change-this')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# --- Static assets ---
+# Files under static/ (except uploads) are fingerprinted at startup:
+# url_for('static', ...) appends ?v=<content hash>, and a request carrying
+# the current hash is cached by browsers and CDNs for a year without
+# revalidation. Text assets are also held in memory with gzip and brotli
+# encodings built once, as is index.html.
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+STATIC_MIN_COMPRESS_SIZE = 256
+# Processed upload variants are named after their content and never change
+IMMUTABLE_UPLOAD = re.compile(r'^uploads/img/[0-9a-f]{32}-\d+\.\w+$')
+
+class CompressedAsset:
+    """File contents held in memory with precomputed encodings and ETag."""
+
+    def __init__(self, data, mimetype):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.encodings = {None: data}
+        if len(data) >= STATIC_MIN_COMPRESS_SIZE:
+            compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli:
+                compressed['br'] = brotli.compress(data, quality=11)
+            for encoding, body in compressed.items():
+                if len(body) < len(data):
+                    self.encodings[encoding] = body
+
+    def negotiate(self):
+        """Best encoding the client accepts, or None for identity."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and request.accept_encodings.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def response(self, max_age, immutable=False):
+        encoding = self.negotiate()
+        response = Response(self.encodings[encoding], mimetype=self.mimetype)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        # Each encoding is a different representation, so it gets its own tag
+        response.set_etag(f"{self.etag}-{encoding}" if encoding else self.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if immutable:
+            response.cache_control.immutable = True
+        elif max_age == 0:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+def load_static_assets():
+    """Fingerprint every file under static/ and keep text assets in memory."""
+    fingerprints = {}
+    assets = {}
+    for root, dirs, files in os.walk(app.static_folder):
+        # Uploads change at runtime and are cached by name instead
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.abspath(app.config['UPLOAD_FOLDER'])]
+        for name in files:
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            fingerprints[filename] = hashlib.sha256(data).hexdigest()[:12]
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if mimetype.startswith(STATIC_COMPRESSIBLE_TYPES):
+                assets[filename] = CompressedAsset(data, mimetype)
+    return fingerprints, assets
+
+static_fingerprints, static_assets = load_static_assets()
+
+def load_index_page():
+    """index.html with its static links fingerprinted, ready to serve."""
+    with open(os.path.join(app.root_path, 'index.html'), 'rb') as f:
+        html = f.read().decode('utf-8')
+    # The file links static/... relatively so it also works when hosted on
+    # its own; only the copy served here gets the fingerprints
+    html = re.sub(r'(["\'])static/([^"\'?#]+)\1',
+                  lambda m: f"{m.group(1)}static/{m.group(2)}?v={static_fingerprints[m.group(2)]}{m.group(1)}"
+                  if m.group(2) in static_fingerprints else m.group(0),
+                  html)
+    return CompressedAsset(html.encode('utf-8'), 'text/html')
+
+index_page = load_index_page()
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and values.get('filename') in static_fingerprints:
+        values.setdefault('v', static_fingerprints[values['filename']])
+
+def serve_static(filename):
+    """Static file view with fingerprint-aware caching and precompressed assets."""
+    fingerprint = static_fingerprints.get(filename)
+    immutable = (fingerprint is not None and request.args.get('v') == fingerprint) or bool(IMMUTABLE_UPLOAD.match(filename))
+    max_age = STATIC_IMMUTABLE_MAX_AGE if immutable else STATIC_MAX_AGE
+    if filename in static_assets:
+        return static_assets[filename].response(max_age, immutable)
+    response = send_from_directory(app.static_folder, filename, max_age=max_age)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+# --- Response compression ---
+# Dynamic responses (rendered pages, JSON, streamed CSV) are compressed on
+# the way out. Responses that already carry a Content-Encoding, such as the
+# precompressed static assets, pass through untouched.
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+# Low brotli qualities are faster than gzip -6 and still smaller
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+def accepted_encoding(header):
+    """Pick br or gzip from an Accept-Encoding header, or None."""
+    accepted = parse_accept_header(header)
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and not brotli:
+            continue
+        if accepted.quality(encoding) > 0:
+            return encoding
+    return None
+
+class StreamCompressor:
+    """Incremental gzip/brotli encoder that flushes after every chunk.
+
+    Flushing keeps streamed responses streaming: each chunk the app yields
+    reaches the client as soon as it is produced.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+class CompressedBody:
+    """Response iterable that compresses the wrapped one chunk by chunk."""
+
+    def __init__(self, app_iter, compressor):
+        self.app_iter = app_iter
+        self.compressor = compressor
+
+    def __iter__(self):
+        for chunk in self.app_iter:
+            if chunk:
+                data = self.compressor.compress(chunk)
+                if data:
+                    yield data
+        yield self.compressor.finish()
+
+    def close(self):
+        # Runs the app's call_on_close callbacks, e.g. releasing the
+        # export's connection
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
+
+class CompressionMiddleware:
+    """WSGI middleware compressing responses with brotli or gzip."""
+
+    def __init__(self, wsgi_app, min_size=COMPRESS_MIN_SIZE):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+
+    def should_compress(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or int(status.split(' ', 1)[0]) in (204, 206, 304):
+            return False
+        content_type = headers.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES) or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        # Streamed responses have no length and are always compressed
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = accepted_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        compressor = None
+
+        def compressing_start_response(status, response_headers, exc_info=None):
+            nonlocal compressor
+            headers = Headers(response_headers)
+            if encoding and self.should_compress(environ, status, headers):
+                compressor = StreamCompressor(encoding)
+                headers.remove('Content-Length')
+                headers['Content-Encoding'] = encoding
+                # A strong validator must not cover both representations
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = f"W/{etag}"
+            if 'Content-Type' in headers:
+                vary = headers.get('Vary', '')
+                if 'accept-encoding' not in vary.lower():
+                    headers['Vary'] = f"{vary}, Accept-Encoding" if vary else 'Accept-Encoding'
+            write = start_response(status, headers.to_wsgi_list(), exc_info)
+            if compressor is None:
+                return write
+            return lambda data: write(compressor.compress(data))
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        if compressor is None:
+            return app_iter
+        return CompressedBody(app_iter, compressor)
+
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
 # --- Login System ---
 
 def login_required(f):
@@ -34,30 +281,33 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def admin_required(f):
+    """Like login_required, but only for the users listed in ADMIN_USERS."""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'success': False, 'message': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        
-        if user:
-            flash('Username already exists. Please choose another.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('register'))
+        with transaction() as cursor:
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            user = cursor.fetchone()
             
-        password_hash = generate_password_hash(password)
-        
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (%s, %s)", (username, password_hash))
-        conn.commit()
-        cursor.close()
-        conn.close()
+            if user:
+                flash('Username already exists. Please choose another.', 'danger')
+                return redirect(url_for('register'))
+                
+            password_hash = generate_password_hash(password)
+            
+            cursor.execute("INSERT INTO users (username, password_hash) VALUES (%s, %s)", (username, password_hash))
         
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('login'))
@@ -70,12 +320,9 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            user = cursor.fetchone()
         
         if user and check_password_hash(user['password_hash'], password):
             session['logged_in'] = True
@@ -101,38 +348,783 @@ db_config = {
     "user": os.environ.get('DB_USER', "root"),
     "password": os.environ.get('DB_PASSWORD', "123"),
     "database": os.environ.get('DB_NAME', "skincare_shop"),
-    "pool_name": "skincare_pool",
-    "pool_size": 20,  # Increased from 5 to 20
-    "pool_reset_session": True  # Reset session variables when returning to pool
 }
 
+# The database allows DB_MAX_CONNECTIONS for the whole service; each gunicorn
+# worker (WEB_CONCURRENCY, as read by gunicorn) gets an equal share.
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 20))
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', max(2, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)))
+DB_POOL_MAX_WAITERS = int(os.environ.get('DB_POOL_MAX_WAITERS', 50))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', 30))
+POOL_WAIT_BUCKETS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+# Connections held longer than this many seconds are reported as likely leaks
+DB_LEAK_THRESHOLD = float(os.environ.get('DB_LEAK_THRESHOLD', 10))
+
+class PooledConnection:
+    """Connection checked out of ConnectionPool.
+
+    Behaves like the underlying MySQL connection, except that ``close()``
+    hands it back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = time.monotonic()
+        self._last_used = self._created_at
+        self._returned = True
+        self._checked_out_at = None
+        self._holder = None
+        self._leak_reported = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._pool.release(self)
+
+class ConnectionPool:
+    """Bounded MySQL connection pool with a blocking, time-limited acquire.
+
+    When every connection is in use, callers queue for up to ``timeout``
+    seconds; at most ``max_waiters`` may queue before new requests fail
+    fast. Idle connections are pinged before reuse and replaced once they
+    are older than ``max_lifetime``.
+    """
+
+    def __init__(self, config, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, max_waiters=DB_POOL_MAX_WAITERS,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, ping_after=DB_POOL_PING_AFTER, leak_threshold=DB_LEAK_THRESHOLD):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.leak_threshold = leak_threshold
+        self.condition = threading.Condition()
+        self.idle = []
+        self.checked_out = set()
+        self.open_count = 0
+        self.in_use = 0
+        self.waiters = 0
+        self.pid = os.getpid()
+        self.counters = {'acquired': 0, 'created': 0, 'discarded': 0, 'timeouts': 0, 'rejected': 0, 'leaks': 0}
+        self.wait_histogram = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+        self.total_wait = 0.0
+
+    def _check_fork(self):
+        # Connections opened before a fork belong to the parent process
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.idle = []
+            self.checked_out = set()
+            self.open_count = self.in_use = self.waiters = 0
+
+    def _connect(self):
+        conn = PooledConnection(self, mysql.connector.connect(**self.config))
+        self.counters['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self.counters['discarded'] += 1
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, conn):
+        now = time.monotonic()
+        if now - conn._created_at > self.max_lifetime:
+            return False
+        if now - conn._last_used > self.ping_after:
+            try:
+                conn._raw.ping(reconnect=False)
+            except mysql.connector.Error:
+                return False
+        return True
+
+    def _record_wait(self, waited):
+        self.total_wait += waited
+        waited_ms = waited * 1000
+        for i, bound in enumerate(POOL_WAIT_BUCKETS_MS):
+            if waited_ms <= bound:
+                self.wait_histogram[i] += 1
+                return
+        self.wait_histogram[-1] += 1
+
+    def _report_leaks(self):
+        # Called with the lock held: log connections held past the threshold
+        now = time.monotonic()
+        for conn in self.checked_out:
+            held = now - conn._checked_out_at
+            if held > self.leak_threshold and not conn._leak_reported:
+                conn._leak_reported = True
+                self.counters['leaks'] += 1
+                app.logger.warning("Possible connection leak: %s has held a connection for %.1fs",
+                                   conn._holder, held)
+
+    def _take_idle(self):
+        # Called with the lock held: reuse an idle connection, or reserve a
+        # slot for a new one
+        if self.idle:
+            return self.idle.pop()
+        self.open_count += 1
+        return None
+
+    def get_connection(self):
+        """Check out a connection, waiting up to ``timeout`` seconds for one."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self.condition:
+            self._check_fork()
+            self._report_leaks()
+            if not self.idle and self.open_count >= self.size and self.waiters >= self.max_waiters:
+                self.counters['rejected'] += 1
+                raise mysql.connector.errors.PoolError("Connection pool wait queue is full")
+            self.waiters += 1
+            try:
+                while not self.idle and self.open_count >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        raise mysql.connector.errors.PoolError(
+                            f"Timed out after {self.timeout}s waiting for a database connection")
+                    self.condition.wait(remaining)
+            finally:
+                self.waiters -= 1
+            conn = self._take_idle()
+            self.in_use += 1
+
+        # Validation and connecting happen outside the lock
+        try:
+            while conn is not None and not self._is_usable(conn):
+                self._discard(conn)
+                with self.condition:
+                    self.open_count -= 1
+                    conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self.condition:
+                self.open_count -= 1
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+
+        conn._returned = False
+        conn._checked_out_at = time.monotonic()
+        conn._holder = request.endpoint if has_request_context() else threading.current_thread().name
+        conn._leak_reported = False
+        with self.condition:
+            self.counters['acquired'] += 1
+            self._record_wait(conn._checked_out_at - started)
+            self.checked_out.add(conn)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, resetting any open transaction."""
+        healthy = True
+        try:
+            if conn._raw.unread_result:
+                conn._raw.consume_results()
+            if conn._raw.in_transaction:
+                conn._raw.rollback()
+        except Exception:
+            healthy = False
+        conn._last_used = time.monotonic()
+        held = conn._last_used - conn._checked_out_at
+        if held > self.leak_threshold and not conn._leak_reported:
+            app.logger.warning("Connection held by %s for %.1fs before being returned", conn._holder, held)
+        with self.condition:
+            self.checked_out.discard(conn)
+            self.in_use -= 1
+            if healthy and os.getpid() == self.pid:
+                self.idle.append(conn)
+            else:
+                self.open_count -= 1
+                self._discard(conn)
+            self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            acquired = self.counters['acquired']
+            return {
+                'size': self.size,
+                'open': self.open_count,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'waiters': self.waiters,
+                'max_waiters': self.max_waiters,
+                'timeout': self.timeout,
+                'holders': sorted(str(conn._holder) for conn in self.checked_out),
+                'avg_wait_ms': round(self.total_wait * 1000 / acquired, 3) if acquired else None,
+                'wait_histogram_ms': {
+                    **{f'<={bound}': count for bound, count in zip(POOL_WAIT_BUCKETS_MS, self.wait_histogram)},
+                    f'>{POOL_WAIT_BUCKETS_MS[-1]}': self.wait_histogram[-1],
+                },
+                **self.counters,
+            }
+
+cnx_pool = ConnectionPool(db_config)
 try:
-    cnx_pool = mysql.connector.pooling.MySQLConnectionPool(**db_config)
+    # Open the first connection now so configuration problems show up at startup
+    cnx_pool.get_connection().close()
 except mysql.connector.Error as err:
     print(f"FATAL: Database connection failed: {err}")
     print("Please ensure the database is running and the credentials in your .env file are correct.")
-    cnx_pool = None
-
-def get_db_connection():
-    """Get a connection from the pool."""
-    if cnx_pool is None:
-        raise RuntimeError("Database connection is not available.")
-    try:
-        return cnx_pool.get_connection()
-    except mysql.connector.errors.PoolError:
-        # If pool is exhausted, wait a bit and try again
-        time.sleep(0.1)
-        return cnx_pool.get_connection()
-
-def close_db_connection(conn, cursor=None):
-    """Safely close database cursor and connection."""
-    try:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+# Data access helpers. Always go through these so pooled connections are
+# returned on every path, including exceptions.
+
+@contextmanager
+def db_connection():
+    """Check out a pooled connection and return it when the block exits."""
+    conn = cnx_pool.get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def close_cursor(cursor):
+    """Close a cursor, ignoring errors from unread results."""
+    try:
+        cursor.close()
     except Exception as e:
-        print(f"Error closing database connection: {e}")
+        print(f"Error closing database cursor: {e}")
+
+@contextmanager
+def db_cursor(dictionary=True, **kwargs):
+    """Cursor on a pooled connection, for reads."""
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=dictionary, **kwargs)
+        try:
+            yield cursor
+        finally:
+            close_cursor(cursor)
+
+@contextmanager
+def transaction(dictionary=True):
+    """Cursor whose statements commit together when the block exits.
+
+    Any exception rolls the transaction back before it propagates.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            close_cursor(cursor)
+
+@app.route('/admin/pool')
+@admin_required
+def pool_stats():
+    return jsonify({'success': True, 'pool': cnx_pool.stats()})
+
+# --- Instrumentation ---
+# Every statement run through a pooled connection is timed by TimedCursor
+# and passed to record_query(), which adds it to the current request's
+# totals and to every function registered with @query_listener. Per-request
+# wall time, query count and DB time are sent back in a Server-Timing header
+# and aggregated per endpoint for /metrics (Prometheus text format). Metrics
+# are per process: with several gunicorn workers each scrape sees one worker.
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+REQUEST_DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+# Bearer token Prometheus sends to /metrics; without one only admins may read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Usernames allowed to read /metrics and profile requests with ?_profile=1
+ADMIN_USERS = {name.strip() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip()}
+PROFILE_TOP_FUNCTIONS = 60
+QUERY_LISTENERS = []
+SQL_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+
+def query_listener(f):
+    """Register ``f(sql, params, seconds)`` to be called after every statement."""
+    QUERY_LISTENERS.append(f)
+    return f
+
+def is_admin():
+    return session.get('logged_in') and session.get('username') in ADMIN_USERS
+
+class TimedCursor:
+    """MySQL cursor wrapper that times statements and counts fetched rows."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            record_rows(1)
+            yield row
+
+    def _timed(self, method, sql, params):
+        started = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            record_query(sql, params, time.perf_counter() - started)
+
+    def execute(self, sql, params=None):
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, params):
+        return self._timed(self._cursor.executemany, sql, params)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_rows(len(rows))
+        return rows
+
+class RequestStats:
+    """Database work done while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+def request_stats():
+    """The current request's RequestStats, or None outside a request."""
+    return g.get('request_stats') if has_request_context() else None
+
+def record_query(sql, params, seconds):
+    stats = request_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+    for listener in QUERY_LISTENERS:
+        listener(sql, params, seconds)
+
+def record_rows(count):
+    stats = request_stats()
+    if stats is not None:
+        stats.rows += count
+
+def redact_sql(sql):
+    """Statement text with whitespace collapsed and string literals masked."""
+    return SQL_STRING_LITERAL.sub("'?'", ' '.join(str(sql).split()))
+
+def redact_params(params):
+    """Describe statement parameters by type only, so values never reach the logs."""
+    if not params:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)) and params and isinstance(params[0], (list, tuple, dict)):
+        return f"<{len(params)} rows>"
+    return [type(value).__name__ for value in params]
+
+@query_listener
+def log_slow_query(sql, params, seconds):
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        metrics.count_slow_query()
+        app.logger.warning("Slow query (%.1f ms) in %s: %s params=%s", seconds * 1000,
+                           request.endpoint if has_request_context() else threading.current_thread().name,
+                           redact_sql(sql), redact_params(params))
+
+class Metrics:
+    """Per-endpoint request and query totals, rendered for Prometheus."""
+
+    def __init__(self, buckets=REQUEST_DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.durations = {}
+        self.queries = {}
+        self.slow_queries = 0
+
+    def observe(self, endpoint, method, status, seconds, stats):
+        with self.lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.durations.setdefault(endpoint, [[0] * (len(self.buckets) + 1), 0.0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+                    break
+            else:
+                histogram[0][-1] += 1
+            histogram[1] += seconds
+            totals = self.queries.setdefault(endpoint, [0, 0.0, 0])
+            totals[0] += stats.queries
+            totals[1] += stats.db_seconds
+            totals[2] += stats.rows
+
+    def count_slow_query(self):
+        with self.lock:
+            self.slow_queries += 1
+
+    def render(self):
+        """Prometheus text exposition of these metrics plus the pool, caches and jobs."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{prometheus_labels(labels)} {value}")
+
+        with self.lock:
+            requests = dict(self.requests)
+            durations = {endpoint: (list(counts), total) for endpoint, (counts, total) in self.durations.items()}
+            queries = {endpoint: list(totals) for endpoint, totals in self.queries.items()}
+            slow_queries = self.slow_queries
+
+        metric('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.',
+               [('', {'endpoint': e, 'method': m, 'status': s}, n) for (e, m, s), n in sorted(requests.items())])
+        samples = []
+        for endpoint, (counts, total) in sorted(durations.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ['+Inf'], counts):
+                cumulative += count
+                samples.append(('_bucket', {'endpoint': endpoint, 'le': bound}, cumulative))
+            samples.append(('_sum', {'endpoint': endpoint}, round(total, 6)))
+            samples.append(('_count', {'endpoint': endpoint}, cumulative))
+        metric('http_request_duration_seconds', 'histogram', 'Request wall time, by endpoint.', samples)
+        metric('db_queries_total', 'counter', 'SQL statements run while serving requests, by endpoint.',
+               [('', {'endpoint': e}, t[0]) for e, t in sorted(queries.items())])
+        metric('db_query_seconds_total', 'counter', 'Time spent in SQL statements while serving requests, by endpoint.',
+               [('', {'endpoint': e}, round(t[1], 6)) for e, t in sorted(queries.items())])
+        metric('db_rows_fetched_total', 'counter', 'Rows fetched while serving requests, by endpoint.',
+               [('', {'endpoint': e}, t[2]) for e, t in sorted(queries.items())])
+        metric('db_slow_queries_total', 'counter', f'Statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms).',
+               [('', {}, slow_queries)])
+
+        pool = cnx_pool.stats()
+        for key in ('size', 'open', 'in_use', 'idle', 'waiters'):
+            metric(f'db_pool_{key}', 'gauge', f'Connections in the pool: {key.replace("_", " ")}.', [('', {}, pool[key])])
+        metric('db_pool_events_total', 'counter', 'Connection pool events.',
+               [('', {'event': key}, pool[key]) for key in ('acquired', 'created', 'discarded', 'timeouts', 'rejected', 'leaks')])
+
+        cache_stats = [(cache.name, cache.stats())
+                       for cache in (catalog_cache, product_typeahead_cache, customer_cache)]
+        metric('cache_lookups_total', 'counter', 'Read-through cache lookups, by cache and result.',
+               [('', {'cache': name, 'result': result}, stats[key])
+                for name, stats in cache_stats for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+        metric('cache_entries', 'gauge', 'Entries held by each read-through cache.',
+               [('', {'cache': name}, stats['entries']) for name, stats in cache_stats])
+
+        flights = [catalog_cache.flight, product_typeahead_cache.flight, customer_cache.flight, product_search_flight]
+        metric('singleflight_calls_total', 'counter', 'Coalesced loads, by flight: run, or shared with a concurrent caller.',
+               [('', {'flight': flight.name, 'result': result}, flight.stats()[key])
+                for flight in flights for result, key in (('run', 'executed'), ('shared', 'shared'))])
+        metric('rate_limit_requests_total', 'counter', 'Requests checked against each rate limit, by outcome.',
+               [('', {'limit': limiter.name, 'outcome': outcome}, limiter.stats()[outcome])
+                for limiter in RATE_LIMITERS for outcome in ('allowed', 'limited')])
+
+        with job_queue.lock:
+            job_counters = dict(job_queue.counters)
+        metric('jobs_total', 'counter', 'Background jobs handled by this process, by outcome.',
+               [('', {'outcome': outcome}, count) for outcome, count in job_counters.items()])
+        return "\n".join(lines) + "\n"
+
+def prometheus_labels(labels):
+    """Render a label dict as {key="value",...}, or '' when empty."""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+metrics = Metrics()
+
+@app.before_request
+def start_request_stats():
+    g.request_stats = RequestStats()
+    if request.args.get('_profile') == '1' and is_admin():
+        return start_profiling()
+
+@app.after_request
+def record_request_stats(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    if g.get('profiler') is not None:
+        response = finish_profiling(response, stats)
+    elapsed = time.perf_counter() - stats.started
+    response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                         f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries, {stats.rows} rows"')
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe(endpoint, request.method, response.status_code, elapsed, stats)
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning("Slow request (%.1f ms) %s %s: %d queries, %.1f ms in the database, %d rows",
+                           elapsed * 1000, request.method, endpoint, stats.queries, stats.db_seconds * 1000, stats.rows)
+    return response
+
+# Only one profiler can run at a time in a process
+profile_lock = threading.Lock()
+
+def start_profiling():
+    """Profile the rest of this request, for ?_profile=1."""
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Another request is being profiled'}), 409
+    if pyinstrument:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    g.profiler = profiler
+
+def stop_profiling():
+    """Stop this request's profiler, if any, and return it."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        if pyinstrument:
+            profiler.stop()
+        else:
+            profiler.disable()
+        profile_lock.release()
+    return profiler
+
+@app.teardown_request
+def stop_failed_profiling(exc):
+    # after_request is skipped when the view raises
+    stop_profiling()
+
+def finish_profiling(response, stats):
+    """Replace ``response`` with the profile of the request that produced it."""
+    try:
+        # A streamed body runs after the view returns; drain it so the
+        # profile covers the whole response
+        if response.is_streamed:
+            response.get_data()
+    finally:
+        response.close()
+        profiler = stop_profiling()
+    summary = (f"{request.method} {request.full_path} -> {response.status}\n"
+               f"{stats.queries} queries, {stats.db_seconds * 1000:.1f} ms in the database, {stats.rows} rows\n\n")
+    if pyinstrument:
+        return Response(profiler.output_html(), mimetype='text/html')
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return Response(summary + output.getvalue(), mimetype='text/plain')
+
+@app.route('/metrics')
+def prometheus_metrics():
+    authorized = (METRICS_TOKEN and secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}")) \
+        or is_admin()
+    if not authorized:
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Background jobs ---
+# Slow side effects (image processing, file deletion) run outside the
+# request through enqueue_job(). 'local' runs them on a thread inside each
+# web process; 'mysql' stores them in the jobs table for the worker started
+# with `flask --app app worker`, which survives restarts and scales apart
+# from the web workers.
+JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'local')
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+# A running job not finished after this many seconds is assumed lost with
+# its worker and queued again
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register the function that runs jobs of ``kind``."""
+    def register(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return register
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a job that failed ``attempts`` times."""
+    return JOB_RETRY_DELAY * 2 ** (attempts - 1)
+
+class LocalJobQueue:
+    """In-process queue drained by a daemon thread, for single-box setups.
+
+    Jobs still queued when the process exits are lost.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.counters = {'enqueued': 0, 'succeeded': 0, 'retried': 0, 'failed': 0}
+
+    def _ensure_thread(self):
+        # gunicorn forks after import, so each worker starts its own thread
+        with self.lock:
+            if self.pid != os.getpid() or self.thread is None or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.queue = queue.Queue()
+                self.thread = threading.Thread(target=self._run, name='job-queue', daemon=True)
+                self.thread.start()
+
+    def enqueue(self, kind, payload):
+        self._ensure_thread()
+        self.queue.put((kind, payload, 1))
+        with self.lock:
+            self.counters['enqueued'] += 1
+
+    def _run(self):
+        while True:
+            kind, payload, attempt = self.queue.get()
+            try:
+                with app.app_context():
+                    JOB_HANDLERS[kind](**payload)
+                outcome = 'succeeded'
+            except Exception as e:
+                print(f"Job {kind} failed (attempt {attempt}): {e}")
+                if attempt < JOB_MAX_ATTEMPTS:
+                    outcome = 'retried'
+                    timer = threading.Timer(retry_delay(attempt), self.queue.put, [(kind, payload, attempt + 1)])
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    outcome = 'failed'
+            with self.lock:
+                self.counters[outcome] += 1
+
+    def stats(self):
+        with self.lock:
+            return {'backend': 'local', 'queued': self.queue.qsize(), **self.counters}
+
+class MySQLJobQueue:
+    """Durable queue in the jobs table, drained by ``flask --app app worker``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'succeeded': 0, 'retried': 0, 'failed': 0}
+
+    def _count(self, outcome):
+        with self.lock:
+            self.counters[outcome] += 1
+
+    def enqueue(self, kind, payload):
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("INSERT INTO jobs (kind, payload, max_attempts) VALUES (%s, %s, %s)",
+                           (kind, json.dumps(payload), JOB_MAX_ATTEMPTS))
+        self._count('enqueued')
+
+    def claim(self):
+        """Atomically take the oldest due job; returns its row or None."""
+        token = secrets.token_hex(16)
+        with transaction() as cursor:
+            # Requeue jobs whose worker died mid-run
+            cursor.execute("""
+                UPDATE jobs
+                SET status = IF(attempts >= max_attempts, 'failed', 'queued'), claim_token = NULL
+                WHERE status = 'running' AND locked_at < NOW() - INTERVAL %s SECOND
+            """, (JOB_TIMEOUT,))
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'running', claim_token = %s, locked_at = NOW(), attempts = attempts + 1
+                WHERE status = 'queued' AND run_after <= NOW()
+                ORDER BY id
+                LIMIT 1
+            """, (token,))
+            if cursor.rowcount == 0:
+                return None
+            cursor.execute("SELECT id, kind, payload, attempts, max_attempts FROM jobs WHERE claim_token = %s",
+                           (token,))
+            return cursor.fetchone()
+
+    def run_one(self):
+        """Claim and run a single job. Returns False when nothing was due."""
+        job = self.claim()
+        if not job:
+            return False
+        try:
+            JOB_HANDLERS[job['kind']](**json.loads(job['payload']))
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) failed (attempt {job['attempts']}): {e}")
+            retry = job['attempts'] < job['max_attempts']
+            with transaction(dictionary=False) as cursor:
+                cursor.execute("""
+                    UPDATE jobs
+                    SET status = %s, claim_token = NULL, last_error = %s,
+                        run_after = NOW() + INTERVAL %s SECOND
+                    WHERE id = %s
+                """, ('queued' if retry else 'failed', str(e)[:1000], int(retry_delay(job['attempts'])), job['id']))
+            self._count('retried' if retry else 'failed')
+            return True
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("UPDATE jobs SET status = 'done', claim_token = NULL, finished_at = NOW() WHERE id = %s",
+                           (job['id'],))
+        self._count('succeeded')
+        return True
+
+    def stats(self):
+        with db_cursor() as cursor:
+            cursor.execute("SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status")
+            depth = {row['status']: row['jobs'] for row in cursor.fetchall()}
+            cursor.execute("""
+                SELECT TIMESTAMPDIFF(SECOND, MIN(created_at), NOW()) AS age
+                FROM jobs
+                WHERE status = 'queued' AND run_after <= NOW()
+            """)
+            oldest = cursor.fetchone()['age']
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            'backend': 'mysql',
+            'queued': depth.get('queued', 0),
+            'running': depth.get('running', 0),
+            'done': depth.get('done', 0),
+            'dead': depth.get('failed', 0),
+            'oldest_queued_seconds': oldest,
+            **counters,
+        }
+
+job_queue = MySQLJobQueue() if JOB_QUEUE_BACKEND == 'mysql' else LocalJobQueue()
+
+def enqueue_job(kind, **payload):
+    """Run handler ``kind`` with ``payload`` in the background."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_queue.enqueue(kind, payload)
+
+@app.cli.command('worker')
+def worker_command():
+    """Run background jobs from the jobs table until interrupted."""
+    if not isinstance(job_queue, MySQLJobQueue):
+        print("JOB_QUEUE_BACKEND is not 'mysql'; jobs run inside the web processes.")
+        return
+    print(f"Worker started, polling every {JOB_POLL_INTERVAL}s.")
+    while True:
+        try:
+            if not job_queue.run_one():
+                time.sleep(JOB_POLL_INTERVAL)
+        except mysql.connector.Error as e:
+            print(f"Worker database error: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+
+@app.route('/admin/jobs')
+@admin_required
+def job_stats():
+    return jsonify({'success': True, 'jobs': job_queue.stats()})
 
 # Before running, ensure you have created the following MySQL tables:
 #
@@ -176,10 +1168,924 @@ def close_db_connection(conn, cursor=None):
 #  password_hash VARCHAR(255) NOT NULL
 # );
 
+# --- Search ---
+# Searchable columns per table. Each list must match the column list of the
+# table's FULLTEXT index (see migrations/0004_fulltext_indexes.py).
+SEARCH_FIELDS = {
+    'products': ['name'],
+    'customers': ['full_name', 'phone'],
+    'staff': ['full_name', 'position'],
+    'orders': ['code'],
+}
+# 'auto' uses FULLTEXT where the index exists and the trigram index otherwise;
+# 'fulltext', 'trigram' and 'like' force a single backend.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+SEARCH_MAX_IDS = 500
+TRIGRAM_INDEX_TTL = 60
+
+_fulltext_tables = None
+_fulltext_lock = threading.Lock()
+
+def fulltext_tables(cursor):
+    """Return the set of searchable tables that have a FULLTEXT index (cached)."""
+    global _fulltext_tables
+    if _fulltext_tables is None:
+        with _fulltext_lock:
+            if _fulltext_tables is None:
+                cursor.execute("""
+                    SELECT DISTINCT TABLE_NAME as table_name
+                    FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+                """)
+                _fulltext_tables = {row['table_name'] if isinstance(row, dict) else row[0]
+                                    for row in cursor.fetchall()}
+    return _fulltext_tables
+
+def search_terms(query):
+    """Split a search query into normalized words, dropping boolean operators."""
+    cleaned = re.sub(r'[+\-<>()~*"@]+', ' ', query or '').lower()
+    return cleaned.split()
+
+def fulltext_query(query):
+    """Build a BOOLEAN MODE query where every word must match as a prefix.
+
+    With the ngram parser words longer than the token size become phrase
+    searches, so this also matches inside words the way LIKE '%term%' did.
+    """
+    return ' '.join(f'+{term}*' for term in search_terms(query))
+
+def trigrams(text):
+    """Return the set of character trigrams of ``text``."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+    """In-process trigram index over the searchable columns of one table.
+
+    Used when the database has no FULLTEXT index. The index is loaded lazily
+    and rebuilt after TRIGRAM_INDEX_TTL seconds or when invalidated.
+    """
+
+    def __init__(self, table, columns, ttl=TRIGRAM_INDEX_TTL):
+        self.table = table
+        self.columns = columns
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.postings = {}
+        self.loaded_at = None
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def load(self, cursor):
+        columns = ", ".join(self.columns)
+        cursor.execute(f"SELECT id, {columns} FROM {self.table}")
+        documents = {}
+        postings = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                values = [row[column] for column in self.columns]
+                row_id = row['id']
+            else:
+                row_id, values = row[0], row[1:]
+            text = ' '.join(str(value) for value in values if value).lower()
+            documents[row_id] = text
+            for gram in trigrams(text):
+                postings.setdefault(gram, set()).add(row_id)
+        self.documents = documents
+        self.postings = postings
+        self.loaded_at = time.monotonic()
+
+    def search(self, cursor, query, limit=SEARCH_MAX_IDS):
+        """Return matching ids, best match first."""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+                self.load(cursor)
+            documents = self.documents
+            postings = self.postings
+
+        candidates = None
+        for term in terms:
+            grams = trigrams(term)
+            if not grams:
+                continue  # too short for trigrams, checked below
+            for gram in grams:
+                ids = postings.get(gram, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+        if candidates is None:
+            candidates = documents.keys()
+
+        scored = []
+        for row_id in candidates:
+            text = documents[row_id]
+            if not all(term in text for term in terms):
+                continue
+            # Prefer matches at the start of a word, then shorter texts
+            prefix_hits = sum(1 for term in terms if re.search(r'(^|\s)' + re.escape(term), text))
+            scored.append((-prefix_hits, len(text), row_id))
+        scored.sort()
+        return [row_id for _, _, row_id in scored[:limit]]
+
+# Tables small enough to mirror in memory when FULLTEXT is unavailable; the
+# others fall back to a prefix LIKE that can still use a B-tree index.
+TRIGRAM_TABLES = {'products', 'customers', 'staff'}
+trigram_indexes = {table: TrigramIndex(table, SEARCH_FIELDS[table]) for table in TRIGRAM_TABLES}
+
+def invalidate_search_index(table):
+    """Mark the in-process trigram index of ``table`` as stale."""
+    if table in trigram_indexes:
+        trigram_indexes[table].invalidate()
+
+def search_backend(cursor, table):
+    """Pick the search backend to use for ``table``."""
+    backend = SEARCH_BACKEND
+    if backend == 'auto':
+        if table in fulltext_tables(cursor):
+            return 'fulltext'
+        return 'trigram' if table in TRIGRAM_TABLES else 'prefix'
+    if backend == 'trigram' and table not in TRIGRAM_TABLES:
+        return 'prefix'
+    return backend
+
+def like_prefix(query):
+    """LIKE pattern matching values that start with ``query`` taken literally."""
+    return query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_clause(cursor, table, alias, query):
+    """Build a WHERE clause and ranking expression for a text search.
+
+    Returns ``(clause, params, rank, rank_params)``; order by ``rank`` DESC
+    to get the best matches first.
+    """
+    columns = SEARCH_FIELDS[table]
+    backend = search_backend(cursor, table)
+
+    if backend == 'fulltext':
+        match = f"MATCH({', '.join(f'{alias}.{column}' for column in columns)}) AGAINST(%s IN BOOLEAN MODE)"
+        boolean_query = fulltext_query(query)
+        return match, [boolean_query], match, [boolean_query]
+
+    if backend == 'trigram':
+        ids = trigram_indexes[table].search(cursor, query)
+        if not ids:
+            return "1 = 0", [], "0", []
+        placeholders = ", ".join(["%s"] * len(ids))
+        return f"{alias}.id IN ({placeholders})", list(ids), f"-FIELD({alias}.id, {placeholders})", list(ids)
+
+    if backend == 'prefix':
+        clause = "(" + " OR ".join(f"{alias}.{column} LIKE %s" for column in columns) + ")"
+        return clause, [like_prefix(query)] * len(columns), "0", []
+
+    clause = "(" + " OR ".join(f"{alias}.{column} LIKE %s" for column in columns) + ")"
+    return clause, [f"%{like_prefix(query)}"] * len(columns), "0", []
+
+def search_ids(cursor, table, query, limit=SEARCH_MAX_IDS):
+    """Return the ids of the best ``limit`` rows of ``table`` matching ``query``."""
+    if search_backend(cursor, table) == 'trigram':
+        return trigram_indexes[table].search(cursor, query, limit)
+    clause, params, rank, rank_params = search_clause(cursor, table, 't', query)
+    cursor.execute(f"SELECT t.id FROM {table} t WHERE {clause} ORDER BY {rank} DESC LIMIT %s",
+                   tuple(params + rank_params + [limit]))
+    return [row['id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+# --- Product catalog cache ---
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+CATALOG_CACHE_MAX_ENTRIES = 512
+# 'local' keeps the version counter per process; 'mysql' shares it through
+# the cache_versions table so every gunicorn worker sees a bump at once.
+# With JOB_QUEUE_BACKEND=mysql, image jobs invalidate the catalog from the
+# worker process, which only reaches the web workers through the table, so
+# 'mysql' is the default there.
+CATALOG_CACHE_BACKEND = os.environ.get('CATALOG_CACHE_BACKEND',
+                                       'mysql' if JOB_QUEUE_BACKEND == 'mysql' else 'local')
+if JOB_QUEUE_BACKEND == 'mysql' and CATALOG_CACHE_BACKEND != 'mysql':
+    app.logger.warning("JOB_QUEUE_BACKEND=mysql with CATALOG_CACHE_BACKEND=%s: processed images "
+                       "reach cached API responses only after CATALOG_CACHE_TTL", CATALOG_CACHE_BACKEND)
+
+class LocalVersionBackend:
+    """Per-process version counter."""
+
+    def __init__(self):
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        return self.versions.get(name, 0)
+
+    def bump(self, name):
+        with self.lock:
+            self.versions[name] = self.versions.get(name, 0) + 1
+            return self.versions[name]
+
+class MySQLVersionBackend:
+    """Version counter stored in the cache_versions table, shared by all workers."""
+
+    def get(self, name):
+        with db_cursor(dictionary=False) as cursor:
+            cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def bump(self, name):
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("""
+                INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+                ON DUPLICATE KEY UPDATE version = version + 1
+            """, (name,))
+            cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+            return cursor.fetchone()[0]
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller runs the function; callers arriving while it runs wait
+    for it and get the same result (or exception). Nothing is kept once the
+    call returns, so this is not a cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = {'done': threading.Event(), 'value': None, 'error': None}
+                self.executed += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['value']
+        try:
+            call['value'] = fn()
+            return call['value']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+    def stats(self):
+        with self.lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self.calls)}
+
+class CatalogCache:
+    """Read-through cache for product catalog queries.
+
+    Entries are tagged with the catalog version they were loaded at and are
+    dropped once the version moves on or the TTL runs out; past
+    ``max_entries`` the least recently used entry goes. ``version_key``
+    lets a cache follow another cache's version. Every product
+    write must call ``invalidate()``. Orders only move stock, and do not:
+    the qty in cached responses may lag by up to the TTL, while
+    adjust_stock always checks the live value.
+    """
+
+    def __init__(self, name, backend, ttl=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_MAX_ENTRIES,
+                 version_key=None):
+        self.name = name
+        self.backend = backend
+        self.version_key = version_key or name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Concurrent misses on one key load it once
+        self.flight = SingleFlight(name)
+
+    def version(self):
+        return self.backend.get(self.version_key)
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss."""
+        version = self.version()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version and entry[1] > now:
+                self.hits += 1
+                # Move it to the back, so eviction takes the least recently used
+                self.entries[key] = self.entries.pop(key)
+                return entry[2]
+            self.misses += 1
+        value = self.flight.do((version, key), loader)
+        with self.lock:
+            self.entries.pop(key, None)
+            while len(self.entries) >= self.max_entries:
+                # Evict the least recently used entry (dicts keep insertion order)
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = (version, now + self.ttl, value)
+        return value
+
+    def invalidate(self):
+        """Bump the catalog version so no cached entry is served again."""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+        return self.backend.bump(self.version_key)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': type(self.backend).__name__,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'ttl': self.ttl,
+            }
+        stats['version'] = self.version()
+        return stats
+
+catalog_cache = CatalogCache(
+    'products',
+    MySQLVersionBackend() if CATALOG_CACHE_BACKEND == 'mysql' else LocalVersionBackend()
+)
+
+def load_all_products():
+    """Load the full product list for the JSON API."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT * FROM products")
+        return add_image_srcsets(cursor.fetchall())
+
+def products_changed():
+    """Invalidate everything derived from the products table."""
+    invalidate_search_index('products')
+    catalog_cache.invalidate()
+
+# Customer lookups for the order forms, invalidated on every customer write
+customer_cache = CatalogCache(
+    'customers',
+    MySQLVersionBackend() if CATALOG_CACHE_BACKEND == 'mysql' else LocalVersionBackend()
+)
+
+def customers_changed():
+    """Invalidate everything derived from the customers table."""
+    invalidate_search_index('customers')
+    customer_cache.invalidate()
+
+@app.route('/admin/cache')
+@admin_required
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'catalog': catalog_cache.stats(),
+        'product_typeahead': product_typeahead_cache.stats(),
+        'customers': customer_cache.stats(),
+        'product_search': product_search_flight.stats(),
+        'rate_limits': {limiter.name: limiter.stats() for limiter in RATE_LIMITERS},
+    })
+
+# --- Rate limiting ---
+# Token buckets per client: each request takes a token, and tokens refill at
+# RATE_LIMIT_<NAME>_RATE per second up to RATE_LIMIT_<NAME>_BURST. Clients
+# are logged-in users, else their IP address. 'local' keeps the buckets per
+# process (so each gunicorn worker allows the full rate); 'mysql' shares
+# them through the rate_limits table at the cost of a transaction per request.
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'local')
+RATE_LIMIT_MAX_KEYS = 10000
+# Shared buckets idle this long are deleted now and then
+RATE_LIMIT_IDLE_SECONDS = 3600
+# Reverse proxies in front of the app (Render has one); the client address
+# is taken from the X-Forwarded-For entry the outermost of them added
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+def spend_token(tokens, updated_at, rate, burst, now):
+    """Refill a bucket up to ``now`` and take one token from it.
+
+    Returns the tokens left and the seconds to wait for a token, which is 0
+    when one was taken. A bucket seen for the first time (``tokens`` None)
+    starts full.
+    """
+    tokens = burst if tokens is None else min(burst, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+class LocalRateLimitBackend:
+    """Per-process buckets, dropping the least recently used past RATE_LIMIT_MAX_KEYS."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated_at = self.buckets.pop(key, (None, None))
+            tokens, wait = spend_token(tokens, updated_at, rate, burst, now)
+            # Re-inserting keeps the dict ordered by last use
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                del self.buckets[next(iter(self.buckets))]
+        return wait
+
+class MySQLRateLimitBackend:
+    """Buckets stored in the rate_limits table, shared by all workers."""
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("SELECT tokens, updated_at FROM rate_limits WHERE bucket = %s FOR UPDATE", (key,))
+            row = cursor.fetchone()
+            tokens, wait = spend_token(row[0] if row else None, row[1] if row else None, rate, burst, now)
+            cursor.execute("""
+                INSERT INTO rate_limits (bucket, tokens, updated_at) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE tokens = VALUES(tokens), updated_at = VALUES(updated_at)
+            """, (key, tokens, now))
+            if secrets.randbelow(1000) == 0:
+                cursor.execute("DELETE FROM rate_limits WHERE updated_at < %s LIMIT 1000",
+                               (now - RATE_LIMIT_IDLE_SECONDS,))
+        return wait
+
+class RateLimiter:
+    """A named token-bucket limit; a rate of 0 turns it off."""
+
+    def __init__(self, name, rate, burst, backend):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def hit(self, client):
+        """Take a token for ``client``; returns 0, or the seconds to wait."""
+        if self.rate <= 0:
+            return 0
+        try:
+            wait = self.backend.take(f"{self.name}:{client}", self.rate, self.burst)
+        except mysql.connector.Error as err:
+            # Fail open: a limiter outage should not take the API down with it
+            app.logger.warning("Rate limiter %s unavailable: %s", self.name, err)
+            return 0
+        with self.lock:
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        return wait
+
+    def stats(self):
+        with self.lock:
+            return {'rate': self.rate, 'burst': self.burst, 'allowed': self.allowed, 'limited': self.limited}
+
+def make_rate_limiter(name, rate, burst):
+    backend = MySQLRateLimitBackend() if RATE_LIMIT_BACKEND == 'mysql' else LocalRateLimitBackend()
+    env = f"RATE_LIMIT_{name.upper()}"
+    return RateLimiter(name, float(os.environ.get(f"{env}_RATE", rate)),
+                       int(os.environ.get(f"{env}_BURST", burst)), backend)
+
+# Product searches and typeahead lookups
+search_limiter = make_rate_limiter('search', 5, 20)
+# Other public JSON reads (product listing pages)
+api_limiter = make_rate_limiter('api', 20, 60)
+RATE_LIMITERS = (search_limiter, api_limiter)
+
+def client_address():
+    """The client's IP address, looking past TRUSTED_PROXIES proxies."""
+    if TRUSTED_PROXIES:
+        forwarded = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',')]
+        forwarded = [address for address in forwarded if address]
+        if len(forwarded) >= TRUSTED_PROXIES:
+            return forwarded[-TRUSTED_PROXIES]
+    return request.remote_addr
+
+def rate_limit_client():
+    if session.get('user_id') is not None:
+        return f"user:{session['user_id']}"
+    return f"ip:{client_address()}"
+
+def check_rate_limit(limiter):
+    """A 429 response if the current client is over ``limiter``, else None."""
+    wait = limiter.hit(rate_limit_client())
+    if not wait:
+        return None
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({'success': False, 'message': f'Too many requests; retry in {retry_after}s'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def rate_limited(limiter):
+    """Decorator rejecting clients over ``limiter`` with 429 and Retry-After."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return check_rate_limit(limiter) or f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Identical searches running at the same time share one query
+product_search_flight = SingleFlight('product_search')
+
+# --- Typeahead ---
+# The order forms look customers and products up as the user types
+# (static/typeahead.js) instead of embedding every row as <option>s. Each
+# lookup is a prefix match on an indexed column (idx_customers_full_name,
+# idx_customers_phone, idx_products_name), so it reads at most ``limit``
+# index entries however large the table is.
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+TYPEAHEAD_MAX_QUERY = 100
+# Browsers reuse a lookup for this long; the server-side caches are exact
+TYPEAHEAD_MAX_AGE = int(os.environ.get('TYPEAHEAD_MAX_AGE', 30))
+TYPEAHEAD_CACHE_ENTRIES = 256
+
+# Every keystroke is a new key, so product lookups get their own cache
+# instead of pushing the API payloads out of catalog_cache. It follows the
+# catalog's version, so products_changed() drops its entries too.
+product_typeahead_cache = CatalogCache('product_typeahead', catalog_cache.backend,
+                                       max_entries=TYPEAHEAD_CACHE_ENTRIES, version_key='products')
+
+def parse_typeahead_query(args):
+    """Return the ``(q, limit)`` of a typeahead request, clamped."""
+    query = args.get('q', '').strip()[:TYPEAHEAD_MAX_QUERY]
+    try:
+        limit = int(args.get('limit', TYPEAHEAD_LIMIT))
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+    return query, max(1, min(limit, MAX_TYPEAHEAD_LIMIT))
+
+def typeahead_response(key, results):
+    response = jsonify({'success': True, key: results})
+    # Results depend on who may see them, so only the browser keeps them
+    response.cache_control.private = True
+    response.cache_control.max_age = TYPEAHEAD_MAX_AGE
+    return response
+
+def lookup_customers(query, limit):
+    """Customers whose name or phone starts with ``query``, by name."""
+    def load():
+        pattern = like_prefix(query)
+        with db_cursor() as cursor:
+            # One index range per column; OR across the two would scan the table
+            cursor.execute("""
+                (SELECT id, full_name, phone FROM customers WHERE full_name LIKE %s ORDER BY full_name LIMIT %s)
+                UNION
+                (SELECT id, full_name, phone FROM customers WHERE phone LIKE %s ORDER BY full_name LIMIT %s)
+                ORDER BY full_name, id
+                LIMIT %s
+            """, (pattern, limit, pattern, limit, limit))
+            return cursor.fetchall()
+    # The column collation is case-insensitive, so 'Ann' and 'ann' share an entry
+    return customer_cache.get(('typeahead', query.lower(), limit), load)
+
+def lookup_products(query, limit):
+    """Products whose name starts with ``query``, by name."""
+    def load():
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, name, price, qty FROM products
+                WHERE name LIKE %s
+                ORDER BY name, id
+                LIMIT %s
+            """, (like_prefix(query), limit))
+            return cursor.fetchall()
+    return product_typeahead_cache.get((query.lower(), limit), load)
+
+@app.route('/api/typeahead/customers')
+@login_required
+@rate_limited(search_limiter)
+def typeahead_customers():
+    query, limit = parse_typeahead_query(request.args)
+    return typeahead_response('customers', lookup_customers(query, limit))
+
+@app.route('/api/typeahead/products')
+@login_required
+@rate_limited(search_limiter)
+def typeahead_products():
+    query, limit = parse_typeahead_query(request.args)
+    return typeahead_response('products', lookup_products(query, limit))
+
+# --- Images ---
+# Uploads are re-encoded without metadata and stored under a hash of their
+# content in static/uploads/img/, so the same photo uploaded twice is written
+# once. Next to the full-size fallback (at most IMAGE_MAX_SIZE px) each image
+# gets one variant per IMAGE_WIDTHS entry in every IMAGE_FORMATS format:
+#   img/<hash>.jpg          fallback (.png when the image has transparency)
+#   img/<hash>-480.webp     480px wide WebP variant
+# The request only stores the upload as the fallback and marks it
+# img/<hash>.pending; a background job does the encoding.
+IMAGE_DIR = 'img'
+IMAGE_MAX_SIZE = int(os.environ.get('IMAGE_MAX_SIZE', 1600))
+IMAGE_WIDTHS = [160, 480, 960]
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+IMAGE_FORMATS = ['avif', 'webp'] if features.check('avif') else ['webp']
+IMAGE_MIMETYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+IMAGE_NAME = re.compile(rf'^{IMAGE_DIR}/([0-9a-f]{{32}})\.(jpg|png)$')
+# Unreferenced image files younger than this are left alone by the orphan
+# cleanup, since their product or staff row may not be committed yet
+IMAGE_ORPHAN_GRACE = int(os.environ.get('IMAGE_ORPHAN_GRACE', 3600))
+IMAGE_VARIANT_CACHE_SIZE = 4096
+
+def upload_path(filename):
+    return os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+def write_file(filename, data):
+    """Write ``data`` to an upload path atomically."""
+    path = upload_path(filename)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_image(image, filename, fmt):
+    """Encode ``image`` to ``filename`` atomically, without metadata."""
+    options = {
+        'jpg': {'format': 'JPEG', 'quality': IMAGE_QUALITY, 'optimize': True, 'progressive': True},
+        'png': {'format': 'PNG', 'optimize': True},
+        'webp': {'format': 'WEBP', 'quality': IMAGE_QUALITY, 'method': 6},
+        'avif': {'format': 'AVIF', 'quality': IMAGE_QUALITY - 20},
+    }[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    write_file(filename, buffer.getvalue())
+
+def stage_image(data):
+    """Store raw upload bytes as an image's fallback, pending processing.
+
+    Returns ``(stored name, pending)``; ``pending`` is False when the same
+    content was stored before. Raises ValueError if ``data`` is not an image.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    for ext in ('jpg', 'png'):
+        path = upload_path(f"{IMAGE_DIR}/{digest}.{ext}")
+        if os.path.exists(path):
+            # Restart the grace period, so a pending delete job does not
+            # remove the file before the row reusing it is committed
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            return f"{IMAGE_DIR}/{digest}.{ext}", False
+
+    # Only the header is read here; decoding is left to the job
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError('Uploaded file is not a valid image')
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    filename = f"{IMAGE_DIR}/{digest}.{'png' if has_alpha else 'jpg'}"
+
+    os.makedirs(upload_path(IMAGE_DIR), exist_ok=True)
+    write_file(f"{IMAGE_DIR}/{digest}.pending", b'')
+    # The raw upload is served until the job replaces it, so the image
+    # shows up straight away
+    write_file(filename, data)
+    return filename, True
+
+def save_image(file):
+    """Store an uploaded image and queue its processing.
+
+    Returns the stored name (``img/<hash>.<ext>``). Raises ValueError if the
+    upload is not a readable image.
+    """
+    filename, pending = stage_image(file.read())
+    if pending:
+        enqueue_job('process_image', filename=filename)
+    return filename
+
+@job_handler('process_image')
+def process_image(filename):
+    """Encode the fallback and every variant of a staged image."""
+    digest, ext = IMAGE_NAME.match(filename).groups()
+    marker = upload_path(f"{IMAGE_DIR}/{digest}.pending")
+    if not os.path.exists(marker):
+        return
+
+    try:
+        image = Image.open(upload_path(filename))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        # Retrying will not make the file readable
+        print(f"Cannot process {filename}: {e}")
+        os.remove(marker)
+        return
+
+    image = image.convert('RGBA' if ext == 'png' else 'RGB')
+    image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.LANCZOS)
+    for width in IMAGE_WIDTHS:
+        if width >= image.width:
+            break
+        variant = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for fmt in IMAGE_FORMATS + [ext]:
+            write_image(variant, f"{IMAGE_DIR}/{digest}-{width}.{fmt}", fmt)
+    for fmt in IMAGE_FORMATS:
+        write_image(image, f"{IMAGE_DIR}/{digest}-{image.width}.{fmt}", fmt)
+    # The fallback goes last, replacing the raw upload
+    write_image(image, filename, ext)
+    os.remove(marker)
+    # Cached API payloads were built without the srcsets
+    catalog_cache.invalidate()
+
+image_variant_cache = {}
+
+def image_variants(filename):
+    """Map format -> [(width, stored name)] for a processed image, else {}.
+
+    Processed images never change, so complete results are cached.
+    """
+    if filename in image_variant_cache:
+        return image_variant_cache[filename]
+    match = IMAGE_NAME.match(filename or '')
+    if not match:
+        return {}
+    digest, ext = match.groups()
+    prefix = f"{digest}-"
+    try:
+        names = [name for name in os.listdir(upload_path(IMAGE_DIR)) if name.startswith(digest)]
+    except FileNotFoundError:
+        return {}
+    if f"{digest}.pending" in names:
+        return {}
+    variants = {}
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        stem, fmt = name.rsplit('.', 1)
+        if fmt in IMAGE_MIMETYPES and (fmt in IMAGE_FORMATS or fmt == ext):
+            variants.setdefault(fmt, []).append((int(stem[len(prefix):]), f"{IMAGE_DIR}/{name}"))
+    for sizes in variants.values():
+        sizes.sort()
+    if len(image_variant_cache) >= IMAGE_VARIANT_CACHE_SIZE:
+        image_variant_cache.clear()
+    image_variant_cache[filename] = variants
+    return variants
+
+@app.template_global()
+def image_srcsets(filename):
+    """List of (mimetype, srcset) for an uploaded image, best format first.
+
+    Empty for images stored before processing existed or still being
+    processed; use the plain URL.
+    """
+    variants = image_variants(filename)
+    srcsets = []
+    for fmt in IMAGE_FORMATS + ['png', 'jpg']:
+        if fmt in variants:
+            srcset = ", ".join(f"{url_for('static', filename='uploads/' + name)} {width}w"
+                               for width, name in variants[fmt])
+            srcsets.append((IMAGE_MIMETYPES[fmt], srcset))
+    return srcsets
+
+def add_image_srcsets(products):
+    """Add an ``image_srcset`` list of {type, srcset} to each product with an image."""
+    for product in products:
+        if 'image_url' in product:
+            product['image_srcset'] = [{'type': mimetype, 'srcset': srcset}
+                                       for mimetype, srcset in image_srcsets(product['image_url'])]
+    return products
+
+def referenced_images():
+    """Every image name a product or staff row points at."""
+    with db_cursor(dictionary=False) as cursor:
+        cursor.execute("""
+            SELECT image_url FROM products WHERE image_url IS NOT NULL
+            UNION
+            SELECT profile_picture FROM staff WHERE profile_picture IS NOT NULL
+        """)
+        return {row[0] for row in cursor.fetchall()}
+
+def image_files(filename):
+    """The stored files belonging to a processed upload: the file itself plus variants."""
+    match = IMAGE_NAME.match(filename or '')
+    if not match:
+        return []
+    digest = match.group(1)
+    try:
+        names = os.listdir(upload_path(IMAGE_DIR))
+    except FileNotFoundError:
+        return []
+    return [f"{IMAGE_DIR}/{name}" for name in names
+            if name.startswith(digest) and not name.endswith('.pending') and not name.endswith('.tmp')]
+
+def inside_upload_folder(filename):
+    """Whether ``filename`` resolves to a path inside UPLOAD_FOLDER."""
+    root = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    return os.path.realpath(upload_path(filename)).startswith(root + os.sep)
+
+@job_handler('delete_image')
+def remove_unused_image(filename):
+    """Delete an uploaded image and its variants unless something still uses it.
+
+    Only processed image names (IMAGE_NAME) are accepted. Files younger than
+    IMAGE_ORPHAN_GRACE are kept, since a re-upload of the same content may
+    be about to reference them; cleanup-images removes them later.
+    """
+    if not IMAGE_NAME.match(filename or '') or not inside_upload_folder(filename):
+        app.logger.warning("Refusing to delete %r: not a stored image name", filename)
+        return
+    if filename in referenced_images():
+        return
+    try:
+        if os.path.getmtime(upload_path(filename)) > time.time() - IMAGE_ORPHAN_GRACE:
+            return
+    except FileNotFoundError:
+        pass
+    for name in image_files(filename):
+        try:
+            os.remove(upload_path(name))
+        except FileNotFoundError:
+            pass
+    image_variant_cache.pop(filename, None)
+
+def delete_image(filename):
+    """Queue the removal of an image that is no longer referenced."""
+    if filename and IMAGE_NAME.match(filename):
+        enqueue_job('delete_image', filename=filename)
+
+@job_handler('cleanup_images')
+def cleanup_orphan_images():
+    """Delete processed image files no product or staff row refers to."""
+    referenced = {IMAGE_NAME.match(name).group(1) for name in referenced_images() if IMAGE_NAME.match(name)}
+    cutoff = time.time() - IMAGE_ORPHAN_GRACE
+    removed = 0
+    try:
+        names = os.listdir(upload_path(IMAGE_DIR))
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = upload_path(f"{IMAGE_DIR}/{name}")
+        if name[:32] in referenced or os.path.getmtime(path) > cutoff:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    image_variant_cache.clear()
+    print(f"Removed {removed} orphaned image file(s).")
+    return removed
+
+@app.cli.command('cleanup-images')
+def cleanup_images_command():
+    """Remove image files no product or staff row refers to."""
+    if isinstance(job_queue, MySQLJobQueue):
+        enqueue_job('cleanup_images')
+        print("Queued orphaned image cleanup.")
+    else:
+        cleanup_orphan_images()
+
+@app.cli.command('process-images')
+def process_images_command():
+    """Run product and staff images stored before processing existed through the pipeline."""
+    converted = 0
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT 'products' AS tbl, 'image_url' AS col, image_url AS filename FROM products WHERE image_url IS NOT NULL
+            UNION
+            SELECT 'staff', 'profile_picture', profile_picture FROM staff WHERE profile_picture IS NOT NULL
+        """)
+        rows = cursor.fetchall()
+    for row in rows:
+        if IMAGE_NAME.match(row['filename']) or not os.path.exists(upload_path(row['filename'])):
+            continue
+        try:
+            with open(upload_path(row['filename']), 'rb') as f:
+                stored, _ = stage_image(f.read())
+        except ValueError as e:
+            print(f"Skipping {row['filename']}: {e}")
+            continue
+        # This command is the worker here, so process in-line
+        process_image(stored)
+        with transaction(dictionary=False) as cursor:
+            cursor.execute(f"UPDATE {row['tbl']} SET {row['col']} = %s WHERE {row['col']} = %s",
+                           (stored, row['filename']))
+        # The old name came from the database, not a request
+        if inside_upload_folder(row['filename']) and row['filename'] not in referenced_images():
+            os.remove(upload_path(row['filename']))
+        converted += 1
+    products_changed()
+    print(f"Processed {converted} image(s).")
+
 # Product CRUD routes
 @app.route('/')
 def index():
-    return send_file('index.html')
+    return index_page.response(0)
 
 @app.route('/add_product', methods=['POST'])
 @login_required
@@ -194,24 +2100,21 @@ def add_product():
     if 'image' in request.files:
         file = request.files['image']
         if file and allowed_file(file.filename):
-            image_filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO products (code, name, qty, price, image_url, category) VALUES (%s, %s, %s, %s, %s, %s)", (code, name, qty, price, image_filename, category))
-    conn.commit()
-    cursor.close()
-    conn.close()
+            try:
+                image_filename = save_image(file)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('index'))
+
+    with transaction(dictionary=False) as cursor:
+        cursor.execute("INSERT INTO products (code, name, qty, price, image_url, category) VALUES (%s, %s, %s, %s, %s, %s)", (code, name, qty, price, image_filename, category))
+    products_changed()
     flash('Product added successfully!', 'success')
     return redirect(url_for('index'))
 
 @app.route('/edit_product/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_product(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
     if request.method == 'POST':
         name = request.form['name']
         code = request.form['code']
@@ -219,107 +2122,94 @@ def edit_product(id):
         qty = request.form['qty']
         price = request.form['price']
         
-        image_filename = request.form.get('current_image') # Keep old image by default
+        image_filename = None
 
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
+                try:
+                    image_filename = save_image(file)
+                except ValueError as e:
+                    flash(str(e), 'danger')
+                    return redirect(request.url)
             elif file and not allowed_file(file.filename):
                 flash('Invalid file type. Allowed types are png, jpg, jpeg, gif.', 'danger')
-                cursor.close()
-                conn.close()
                 return redirect(request.url)
 
-
-        cursor.execute("""
-            UPDATE products 
-            SET name = %s, code = %s, category = %s, qty = %s, price = %s, image_url = %s 
-            WHERE id = %s
-        """, (name, code, category, qty, price, image_filename, id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            # The replaced image is taken from the row, never from the form
+            cursor.execute("SELECT image_url FROM products WHERE id = %s FOR UPDATE", (id,))
+            product = cursor.fetchone()
+            if not product:
+                flash('Product not found.', 'danger')
+                return redirect(url_for('index'))
+            current_image = product['image_url']
+            if image_filename is None:
+                image_filename = current_image  # Keep old image by default
+            cursor.execute("""
+                UPDATE products 
+                SET name = %s, code = %s, category = %s, qty = %s, price = %s, image_url = %s 
+                WHERE id = %s
+            """, (name, code, category, qty, price, image_filename, id))
+        products_changed()
+        if image_filename != current_image:
+            delete_image(current_image)
         flash('Product updated successfully!', 'success')
         return redirect(url_for('index'))
 
     # GET request
-    cursor.execute("SELECT * FROM products WHERE id = %s", (id,))
-    product = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_cursor() as cursor:
+        cursor.execute("SELECT * FROM products WHERE id = %s", (id,))
+        product = cursor.fetchone()
     return render_template('edit_product.html', product=product)
 
 @app.route('/delete_product/<int:id>')
 @login_required
 def delete_product(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    # Check if product is referenced in order_items
-    cursor.execute("SELECT id FROM order_items WHERE product_id = %s", (id,))
-    order_item = cursor.fetchone()
-    if order_item:
-        flash('Cannot delete product because it is referenced in existing orders.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('index'))
-    # If not referenced, proceed with deletion
-    cursor.close()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM products WHERE id=%s", (id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with transaction() as cursor:
+        # Check if product is referenced in order_items
+        cursor.execute("SELECT id FROM order_items WHERE product_id = %s LIMIT 1", (id,))
+        order_item = cursor.fetchone()
+        if order_item:
+            flash('Cannot delete product because it is referenced in existing orders.', 'danger')
+            return redirect(url_for('index'))
+        # If not referenced, proceed with deletion
+        cursor.execute("DELETE FROM products WHERE id=%s", (id,))
+    products_changed()
     flash('Product deleted!', 'danger')
     return redirect(url_for('index'))
 
 # Customer info routes
+def find_customers(query):
+    """Return all customers, or those matching ``query`` best match first."""
+    with db_cursor() as cursor:
+        if query:
+            # Search for customers by name or phone, best matches first
+            clause, params, rank, rank_params = search_clause(cursor, 'customers', 'c', query)
+            cursor.execute(f"SELECT * FROM customers c WHERE {clause} ORDER BY {rank} DESC",
+                           tuple(params + rank_params))
+        else:
+            # Get all customers if no search query
+            cursor.execute("SELECT * FROM customers")
+        return cursor.fetchall()
+
 @app.route('/customers')
 @login_required
 def customers():
     search_query = request.args.get('search', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if search_query:
-        # Search for customers by name or phone using LIKE
-        cursor.execute("SELECT * FROM customers WHERE full_name LIKE %s OR phone LIKE %s", 
-                      (f'%{search_query}%', f'%{search_query}%'))
-    else:
-        # Get all customers if no search query
-        cursor.execute("SELECT * FROM customers")
-    
-    customers = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    customers = find_customers(search_query)
     return render_template('customers.html', customers=customers, search_query=search_query)
 
 @app.route('/customers/search')
 @login_required
 def customer_search():
     query = request.args.get('query', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if query:
-        # Search for customers by name or phone using LIKE
-        cursor.execute("SELECT * FROM customers WHERE full_name LIKE %s OR phone LIKE %s", 
-                      (f'%{query}%', f'%{query}%'))
-    else:
-        # Get all customers if no search query
-        cursor.execute("SELECT * FROM customers")
-    
-    customers = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    customers = find_customers(query)
     return render_template('customers.html', customers=customers, search_query=query)
 
 @app.route('/add_customer', methods=['POST'])
 @login_required
 def add_customer():
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
         full_name = request.form['full_name']
         code = request.form['code']
@@ -327,47 +2217,36 @@ def add_customer():
         email = request.form['email']
         address = request.form['address']
         gender = request.form.get('gender')
-        cursor.execute("INSERT INTO customers (full_name, code, phone, email, address, gender) VALUES (%s, %s, %s, %s, %s, %s)",
-                       (full_name, code, phone, email, address, gender))
-        conn.commit()
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("INSERT INTO customers (full_name, code, phone, email, address, gender) VALUES (%s, %s, %s, %s, %s, %s)",
+                           (full_name, code, phone, email, address, gender))
+        customers_changed()
         flash('Customer added!', 'success')
     except mysql.connector.Error as err:
         flash(f"Error: {err.msg}", 'danger')
-    
-    cursor.close()
-    conn.close()
     return redirect(url_for('customers'))
 
 @app.route('/delete_customer/<int:id>')
 @login_required
 def delete_customer(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    # Check if the customer has any orders
-    cursor.execute("SELECT id FROM orders WHERE customer_id = %s", (id,))
-    order = cursor.fetchone()
-
-    if order:
-        flash('Cannot delete customer because they have existing orders.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('customers'))
-
-    # If no orders, proceed with deletion
-    cursor.execute("DELETE FROM customers WHERE id=%s", (id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with transaction() as cursor:
+        # Check if the customer has any orders
+        cursor.execute("SELECT id FROM orders WHERE customer_id = %s LIMIT 1", (id,))
+        order = cursor.fetchone()
+
+        if order:
+            flash('Cannot delete customer because they have existing orders.', 'danger')
+            return redirect(url_for('customers'))
+
+        # If no orders, proceed with deletion
+        cursor.execute("DELETE FROM customers WHERE id=%s", (id,))
+    customers_changed()
     flash('Customer deleted successfully!', 'success')
     return redirect(url_for('customers'))
 
 @app.route('/edit_customer/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_customer(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
     if request.method == 'POST':
         try:
             full_name = request.form['full_name']
@@ -376,70 +2255,52 @@ def edit_customer(id):
             email = request.form['email']
             address = request.form['address']
             gender = request.form.get('gender')
-            cursor.execute("UPDATE customers SET full_name=%s, code=%s, phone=%s, email=%s, address=%s, gender=%s WHERE id=%s",
-                           (full_name, code, phone, email, address, gender, id))
-            conn.commit()
+            with transaction() as cursor:
+                cursor.execute("UPDATE customers SET full_name=%s, code=%s, phone=%s, email=%s, address=%s, gender=%s WHERE id=%s",
+                               (full_name, code, phone, email, address, gender, id))
+            customers_changed()
             flash('Customer updated successfully!', 'success')
         except mysql.connector.Error as err:
             flash(f"Error: {err.msg}", 'danger')
-
-        cursor.close()
-        conn.close()
         return redirect(url_for('customers'))
 
     # GET request
-    cursor.execute("SELECT * FROM customers WHERE id = %s", (id,))
-    customer = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_cursor() as cursor:
+        cursor.execute("SELECT * FROM customers WHERE id = %s", (id,))
+        customer = cursor.fetchone()
     return render_template('edit_customer.html', customer=customer)
 
 # Staff Management Routes
+def find_staff(query):
+    """Return all staff, or those matching ``query`` best match first."""
+    with db_cursor() as cursor:
+        if query:
+            # Search for staff by name or position, best matches first
+            clause, params, rank, rank_params = search_clause(cursor, 'staff', 's', query)
+            cursor.execute(f"SELECT * FROM staff s WHERE {clause} ORDER BY {rank} DESC, s.full_name",
+                           tuple(params + rank_params))
+        else:
+            # Get all staff if no search query
+            cursor.execute("SELECT * FROM staff ORDER BY full_name")
+        return cursor.fetchall()
+
 @app.route('/staff')
 @login_required
 def staff():
     search_query = request.args.get('search', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if search_query:
-        # Search for staff by name or position using LIKE
-        cursor.execute("SELECT * FROM staff WHERE full_name LIKE %s OR position LIKE %s ORDER BY full_name", 
-                      (f'%{search_query}%', f'%{search_query}%'))
-    else:
-        # Get all staff if no search query
-        cursor.execute("SELECT * FROM staff ORDER BY full_name")
-    
-    staff_list = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    staff_list = find_staff(search_query)
     return render_template('staff.html', staff_list=staff_list, search_query=search_query)
 
 @app.route('/staff/search')
 @login_required
 def staff_search():
     query = request.args.get('query', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if query:
-        # Search for staff by name or position using LIKE
-        cursor.execute("SELECT * FROM staff WHERE full_name LIKE %s OR position LIKE %s ORDER BY full_name", 
-                      (f'%{query}%', f'%{query}%'))
-    else:
-        # Get all staff if no search query
-        cursor.execute("SELECT * FROM staff ORDER BY full_name")
-    
-    staff_list = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    staff_list = find_staff(query)
     return render_template('staff.html', staff_list=staff_list, search_query=query)
 
 @app.route('/add_staff', methods=['POST'])
 @login_required
 def add_staff():
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
         full_name = request.form['full_name']
         position = request.form['position']
@@ -451,32 +2312,30 @@ def add_staff():
         if 'profile_picture' in request.files:
             file = request.files['profile_picture']
             if file and allowed_file(file.filename):
-                profile_picture_filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], profile_picture_filename))
+                try:
+                    profile_picture_filename = save_image(file)
+                except ValueError as e:
+                    flash(str(e), 'danger')
+                    return redirect(url_for('staff'))
 
         # Generate a unique staff code
         staff_code = f"STF-{secrets.token_hex(4).upper()}"
         gender = request.form.get('gender')
 
-        cursor.execute("""
-            INSERT INTO staff (full_name, position, phone, email, address, profile_picture, code, gender) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (full_name, position, phone, email, address, profile_picture_filename, staff_code, gender))
-        conn.commit()
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("""
+                INSERT INTO staff (full_name, position, phone, email, address, profile_picture, code, gender) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (full_name, position, phone, email, address, profile_picture_filename, staff_code, gender))
+        invalidate_search_index('staff')
         flash('Staff member added successfully!', 'success')
     except mysql.connector.Error as err:
         flash(f"Error: {err.msg}", 'danger')
-    finally:
-        cursor.close()
-        conn.close()
     return redirect(url_for('staff'))
 
 @app.route('/edit_staff/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_staff(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     if request.method == 'POST':
         try:
             full_name = request.form['full_name']
@@ -486,188 +2345,517 @@ def edit_staff(id):
             address = request.form['address']
             gender = request.form.get('gender')
             
-            profile_picture_filename = request.form.get('current_profile_picture')
+            profile_picture_filename = None
 
             if 'profile_picture' in request.files:
                 file = request.files['profile_picture']
                 if file and allowed_file(file.filename):
-                    # Delete old picture if a new one is uploaded
-                    if profile_picture_filename:
-                        try:
-                            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], profile_picture_filename))
-                        except FileNotFoundError:
-                            pass # Ignore if file doesn't exist
-                    
-                    profile_picture_filename = secure_filename(file.filename)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], profile_picture_filename))
-
-            cursor.execute("""
-                UPDATE staff SET full_name=%s, position=%s, phone=%s, email=%s, address=%s, profile_picture=%s, gender=%s 
-                WHERE id=%s
-            """, (full_name, position, phone, email, address, profile_picture_filename, gender, id))
-            conn.commit()
+                    try:
+                        profile_picture_filename = save_image(file)
+                    except ValueError as e:
+                        flash(str(e), 'danger')
+                        return redirect(url_for('edit_staff', id=id))
+
+            with transaction() as cursor:
+                # The replaced picture is taken from the row, never from the form
+                cursor.execute("SELECT profile_picture FROM staff WHERE id = %s FOR UPDATE", (id,))
+                staff_member = cursor.fetchone()
+                if not staff_member:
+                    flash('Staff member not found.', 'danger')
+                    return redirect(url_for('staff'))
+                current_picture = staff_member['profile_picture']
+                if profile_picture_filename is None:
+                    profile_picture_filename = current_picture
+                cursor.execute("""
+                    UPDATE staff SET full_name=%s, position=%s, phone=%s, email=%s, address=%s, profile_picture=%s, gender=%s 
+                    WHERE id=%s
+                """, (full_name, position, phone, email, address, profile_picture_filename, gender, id))
+            invalidate_search_index('staff')
+            # Delete the old picture once nothing refers to it any more
+            if profile_picture_filename != current_picture:
+                delete_image(current_picture)
             flash('Staff member updated successfully!', 'success')
         except mysql.connector.Error as err:
             flash(f"Error: {err.msg}", 'danger')
-        finally:
-            cursor.close()
-            conn.close()
         return redirect(url_for('staff'))
     
     # GET request
-    cursor.execute("SELECT * FROM staff WHERE id = %s", (id,))
-    staff_member = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_cursor() as cursor:
+        cursor.execute("SELECT * FROM staff WHERE id = %s", (id,))
+        staff_member = cursor.fetchone()
     return render_template('edit_staff.html', staff_member=staff_member)
 
 @app.route('/delete_staff/<int:id>')
 @login_required
 def delete_staff(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True) # Use dictionary cursor to get filename
     try:
-        # First, get the filename of the profile picture to delete it from the server
-        cursor.execute("SELECT profile_picture FROM staff WHERE id = %s", (id,))
-        staff_member = cursor.fetchone()
-        if staff_member and staff_member['profile_picture']:
-            try:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], staff_member['profile_picture']))
-            except FileNotFoundError:
-                pass # File was already deleted or never existed
-
-        # Now, delete the staff member record from the database
-        cursor.execute("DELETE FROM staff WHERE id=%s", (id,))
-        conn.commit()
+        with transaction() as cursor:
+            # First, get the filename of the profile picture to delete it from the server
+            cursor.execute("SELECT profile_picture FROM staff WHERE id = %s", (id,))
+            staff_member = cursor.fetchone()
+
+            # Now, delete the staff member record from the database
+            cursor.execute("DELETE FROM staff WHERE id=%s", (id,))
+        invalidate_search_index('staff')
+        if staff_member:
+            delete_image(staff_member['profile_picture'])
         flash('Staff member deleted successfully!', 'success')
     except mysql.connector.Error as err:
         flash(f"Error: {err.msg}", 'danger')
-    finally:
-        cursor.close()
-        conn.close()
     return redirect(url_for('staff'))
 
 # Order system routes
-@app.route('/orders')
-@login_required
-def orders():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+ORDERS_PER_PAGE = 50
+MAX_ORDERS_PER_PAGE = 200
 
-    # Get filter/search parameters
-    customer_id = request.args.get('customer_id')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    search = request.args.get('search')
+def get_page_size():
+    """Read the per_page query parameter, clamped to a sane range."""
+    try:
+        per_page = int(request.args.get('per_page', ORDERS_PER_PAGE))
+    except ValueError:
+        per_page = ORDERS_PER_PAGE
+    return max(1, min(per_page, MAX_ORDERS_PER_PAGE))
+
+def encode_order_cursor(order):
+    """Encode an order's (order_date, id) position as an opaque page cursor."""
+    return f"{order['order_date'].strftime('%Y%m%d%H%M%S')}-{order['id']}"
+
+def decode_order_cursor(value):
+    """Decode a page cursor back into (order_date, id), or None if invalid."""
+    if not value:
+        return None
+    try:
+        stamp, order_id = value.split('-', 1)
+        return datetime.strptime(stamp, '%Y%m%d%H%M%S'), int(order_id)
+    except ValueError:
+        return None
 
-    # Build SQL query dynamically
-    sql = """
-        SELECT 
-            o.id, o.code, o.order_date, o.total, c.full_name as customer,
-            GROUP_CONCAT(CONCAT(p.name, ' (', oi.quantity, ')') SEPARATOR '<br/>') as items_summary
-        FROM orders o
-        JOIN customers c ON o.customer_id = c.id
-        LEFT JOIN order_items oi ON o.id = oi.order_id
-        LEFT JOIN products p ON oi.product_id = p.id
+def order_search_filter(cursor, search, include_products=True):
+    """Build a WHERE clause matching orders by code, customer or product name.
+
+    Matching customers and products are resolved through their own search
+    indexes first, so the orders table is only probed by id.
+    """
+    code_clause, params, _, _ = search_clause(cursor, 'orders', 'o', search)
+    clauses = [code_clause]
+    customer_ids = search_ids(cursor, 'customers', search)
+    if customer_ids:
+        clauses.append(f"o.customer_id IN ({', '.join(['%s'] * len(customer_ids))})")
+        params += customer_ids
+    if include_products:
+        product_ids = search_ids(cursor, 'products', search)
+        if product_ids:
+            clauses.append(f"""EXISTS (SELECT 1 FROM order_items soi
+                WHERE soi.order_id = o.id AND soi.product_id IN ({', '.join(['%s'] * len(product_ids))}))""")
+            params += product_ids
+    return "(" + " OR ".join(clauses) + ")", params
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD filter value; returns None if empty or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def build_order_filters(cursor, customer_id=None, start_date=None, end_date=None, search=None):
+    """Build the WHERE clauses and parameters for the order list filters.
+
+    The clauses expect ``orders o`` joined to ``customers c``.
     """
     filters = []
     params = []
     if customer_id:
         filters.append("o.customer_id = %s")
         params.append(customer_id)
-    if start_date:
-        filters.append("DATE(o.order_date) >= %s")
-        params.append(start_date)
-    if end_date:
-        filters.append("DATE(o.order_date) <= %s")
-        params.append(end_date)
+    # Half-open [start, end + 1 day) ranges keep the filters sargable, so the
+    # order_date index is used instead of evaluating DATE() on every row
+    start = parse_date(start_date)
+    if start:
+        filters.append("o.order_date >= %s")
+        params.append(start)
+    end = parse_date(end_date)
+    if end:
+        filters.append("o.order_date < %s")
+        params.append(end + timedelta(days=1))
     if search:
-        filters.append("(o.code LIKE %s OR c.full_name LIKE %s OR p.name LIKE %s)")
-        params.extend([f"%{search}%", f"%{search}%", f"%{search}%"])
+        clause, search_params = order_search_filter(cursor, search)
+        filters.append(clause)
+        params.extend(search_params)
+    return filters, params
+
+def fetch_order_page(cursor, filters, params, page_size):
+    """Fetch one page of orders using keyset pagination on (order_date, id).
+
+    Orders are listed newest first. The ``after`` cursor moves to older
+    orders and ``before`` moves back to newer ones. Returns the orders on
+    the page together with the next/prev cursors (None when there is no
+    such page).
+    """
+    after = decode_order_cursor(request.args.get('after'))
+    before = decode_order_cursor(request.args.get('before'))
+
+    filters = list(filters)
+    params = list(params)
+    if before:
+        filters.append("(o.order_date > %s OR (o.order_date = %s AND o.id > %s))")
+        params.extend([before[0], before[0], before[1]])
+        order_by = "o.order_date ASC, o.id ASC"
+    else:
+        if after:
+            filters.append("(o.order_date < %s OR (o.order_date = %s AND o.id < %s))")
+            params.extend([after[0], after[0], after[1]])
+        order_by = "o.order_date DESC, o.id DESC"
+
+    # Items are not joined in here: a join plus GROUP BY makes MySQL build
+    # and sort every matching order before the LIMIT applies. They are loaded
+    # for the page's orders only, with fetch_order_items().
+    sql = """
+        SELECT o.id, o.code, o.order_date, o.total, c.full_name as customer
+        FROM orders o
+        JOIN customers c ON o.customer_id = c.id
+    """
     if filters:
         sql += " WHERE " + " AND ".join(filters)
-    sql += " GROUP BY o.id, o.code, o.order_date, o.total, c.full_name ORDER BY o.order_date DESC"
+    # Fetch one extra row to find out whether another page exists
+    sql += f" ORDER BY {order_by} LIMIT %s"
+    params.append(page_size + 1)
 
     cursor.execute(sql, tuple(params))
     orders = cursor.fetchall()
+    has_more = len(orders) > page_size
+    orders = orders[:page_size]
 
-    # Fetch customers and products for the new order form and filter dropdown
-    cursor.execute("SELECT id, full_name FROM customers")
-    customers = cursor.fetchall()
-    cursor.execute("SELECT id, name, price FROM products ORDER BY name")
-    products = cursor.fetchall()
-
-    # Fetch all order items and group by order_id
-    cursor.execute("""
+    if before:
+        orders.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = after is not None, has_more
+
+    next_cursor = encode_order_cursor(orders[-1]) if orders and has_older else None
+    prev_cursor = encode_order_cursor(orders[0]) if orders and has_newer else None
+    return orders, next_cursor, prev_cursor
+
+def fetch_order_items(cursor, order_ids):
+    """Fetch the line items of the given orders, grouped by order_id."""
+    order_items = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return order_items
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    cursor.execute(f"""
         SELECT oi.*, p.name as product_name
         FROM order_items oi
         JOIN products p ON oi.product_id = p.id
-    """)
-    order_items_raw = cursor.fetchall()
-    order_items = {}
-    for item in order_items_raw:
-        order_id = item['order_id']
-        if order_id not in order_items:
-            order_items[order_id] = []
-        order_items[order_id].append(item)
-
-    cursor.close()
-    conn.close()
-    return render_template('orders.html', orders=orders, customers=customers, products=products, order_items=order_items,
-                           filter_customer_id=customer_id, filter_start_date=start_date, filter_end_date=end_date, filter_search=search)
+        WHERE oi.order_id IN ({placeholders})
+        ORDER BY oi.id
+    """, tuple(order_ids))
+    for item in cursor.fetchall():
+        order_items[item['order_id']].append(item)
+    return order_items
+
+@app.route('/api/orders/<int:id>/items')
+@login_required
+def api_order_items(id):
+    """Line items of one order, for clients that expand orders on demand."""
+    with db_cursor() as cursor:
+        items = fetch_order_items(cursor, [id])[id]
+        if not items:
+            cursor.execute("SELECT id FROM orders WHERE id = %s", (id,))
+            if not cursor.fetchone():
+                return jsonify({'success': False, 'message': 'Order not found'}), 404
+    return jsonify({'success': True, 'items': [
+        {field: item[field] for field in ('product_id', 'product_name', 'quantity', 'price', 'subtotal')}
+        for item in items
+    ]})
+
+@app.route('/orders')
+@login_required
+def orders():
+    # Get filter/search parameters
+    customer_id = request.args.get('customer_id')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    search = request.args.get('search')
+    page_size = get_page_size()
+
+    with db_cursor() as cursor:
+        # Build SQL filters dynamically
+        filters, params = build_order_filters(cursor, customer_id, start_date, end_date, search)
+
+        orders, next_cursor, prev_cursor = fetch_order_page(cursor, filters, params, page_size)
+
+        # Name of the filtered customer for the filter's typeahead box
+        customer_name = None
+        if customer_id:
+            cursor.execute("SELECT full_name FROM customers WHERE id = %s", (customer_id,))
+            row = cursor.fetchone()
+            customer_name = row['full_name'] if row else None
+
+        # Fetch only the items of the orders shown on this page
+        order_items = fetch_order_items(cursor, [order['id'] for order in orders])
+
+    page_args = {'customer_id': customer_id, 'start_date': start_date, 'end_date': end_date,
+                 'search': search, 'per_page': page_size}
+    return render_template('orders.html', orders=orders, order_items=order_items,
+                           filter_customer_id=customer_id, filter_customer_name=customer_name,
+                           filter_start_date=start_date, filter_end_date=end_date, filter_search=search,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor, page_args=page_args)
 
 @app.route('/orders/search')
 @login_required
 def order_search():
     query = request.args.get('query', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    page_size = get_page_size()
 
-    # Build SQL query for search
-    sql = """
-        SELECT 
-            o.id, o.code, o.order_date, o.total, c.full_name as customer,
-            GROUP_CONCAT(CONCAT(p.name, ' (', oi.quantity, ')') SEPARATOR '<br/>') as items_summary
-        FROM orders o
-        JOIN customers c ON o.customer_id = c.id
-        LEFT JOIN order_items oi ON o.id = oi.order_id
-        LEFT JOIN products p ON oi.product_id = p.id
-    """
-    
-    if query:
-        sql += " WHERE (o.code LIKE %s OR c.full_name LIKE %s)"
-        sql += " GROUP BY o.id, o.code, o.order_date, o.total, c.full_name ORDER BY o.order_date DESC"
-        cursor.execute(sql, (f'%{query}%', f'%{query}%'))
-    else:
-        sql += " GROUP BY o.id, o.code, o.order_date, o.total, c.full_name ORDER BY o.order_date DESC"
-        cursor.execute(sql)
-    
-    orders = cursor.fetchall()
+    with db_cursor() as cursor:
+        filters = []
+        params = []
+        if query:
+            clause, params = order_search_filter(cursor, query, include_products=False)
+            filters.append(clause)
+
+        orders, next_cursor, prev_cursor = fetch_order_page(cursor, filters, params, page_size)
+
+        # Fetch only the items of the orders shown on this page
+        order_items = fetch_order_items(cursor, [order['id'] for order in orders])
+
+    page_args = {'query': query, 'per_page': page_size}
+    return render_template('orders.html', orders=orders, order_items=order_items,
+                           filter_search=query, next_cursor=next_cursor, prev_cursor=prev_cursor, page_args=page_args)
 
-    # Fetch customers and products for the new order form and filter dropdown
-    cursor.execute("SELECT id, full_name FROM customers")
-    customers = cursor.fetchall()
-    cursor.execute("SELECT id, name, price FROM products ORDER BY name")
-    products = cursor.fetchall()
+def build_order_items(cursor, product_ids, quantities):
+    """Price the submitted order lines with a single product lookup.
 
-    # Fetch all order items and group by order_id
+    Returns the list of line items and the order total. Raises ValueError
+    if a product does not exist.
+    """
+    unique_ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+    prices = {}
+    if unique_ids:
+        placeholders = ", ".join(["%s"] * len(unique_ids))
+        cursor.execute(f"SELECT id, price FROM products WHERE id IN ({placeholders})", tuple(unique_ids))
+        prices = {row['id']: row['price'] for row in cursor.fetchall()}
+
+    total = 0
+    order_items = []
+    for product_id, qty in zip(product_ids, quantities):
+        product_id = int(product_id)
+        if product_id not in prices:
+            raise ValueError(f"Product {product_id} does not exist")
+        qty = int(qty)
+        if qty < 1:
+            raise ValueError("Quantities must be at least 1")
+        subtotal = qty * prices[product_id]
+        total += subtotal
+        order_items.append({
+            'product_id': product_id,
+            'quantity': qty,
+            'price': prices[product_id],
+            'subtotal': subtotal
+        })
+    return order_items, total
+
+def insert_order_items(cursor, order_id, order_items):
+    """Insert order lines with one multi-row INSERT."""
+    if not order_items:
+        return
+    cursor.executemany("""
+        INSERT INTO order_items (order_id, product_id, quantity, price, subtotal) 
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(order_id, item['product_id'], item['quantity'], item['price'], item['subtotal'])
+          for item in order_items])
+
+def sync_order_items(cursor, order_id, order_items):
+    """Bring an order's stored lines in line with ``order_items``.
+
+    Existing rows are matched to the new lines by product, so unchanged lines
+    are left alone, changed ones are updated in place, and only the surplus
+    is deleted or inserted. Returns the lines the order had before.
+    """
     cursor.execute("""
-        SELECT oi.*, p.name as product_name
-        FROM order_items oi
-        JOIN products p ON oi.product_id = p.id
-    """)
-    order_items_raw = cursor.fetchall()
-    order_items = {}
-    for item in order_items_raw:
-        order_id = item['order_id']
-        if order_id not in order_items:
-            order_items[order_id] = []
-        order_items[order_id].append(item)
-
-    cursor.close()
-    conn.close()
-    return render_template('orders.html', orders=orders, customers=customers, products=products, order_items=order_items,
-                           filter_search=query)
+        SELECT id, product_id, quantity, price, subtotal
+        FROM order_items
+        WHERE order_id = %s
+        ORDER BY id
+        FOR UPDATE
+    """, (order_id,))
+    previous = cursor.fetchall()
+    existing = {}
+    for row in previous:
+        existing.setdefault(row['product_id'], []).append(row)
+
+    updates = []
+    inserts = []
+    for item in order_items:
+        rows = existing.get(item['product_id'])
+        if not rows:
+            inserts.append(item)
+            continue
+        row = rows.pop(0)
+        if (row['quantity'], row['price'], row['subtotal']) != (item['quantity'], item['price'], item['subtotal']):
+            updates.append((item['quantity'], item['price'], item['subtotal'], row['id']))
+    deletes = [row['id'] for rows in existing.values() for row in rows]
+
+    if deletes:
+        placeholders = ", ".join(["%s"] * len(deletes))
+        cursor.execute(f"DELETE FROM order_items WHERE id IN ({placeholders})", tuple(deletes))
+    if updates:
+        cursor.executemany("UPDATE order_items SET quantity=%s, price=%s, subtotal=%s WHERE id=%s", updates)
+    insert_order_items(cursor, order_id, inserts)
+    return previous
+
+# --- Stock ---
+class InsufficientStock(ValueError):
+    """An order asked for more units of a product than are in stock."""
+
+def item_quantities(order_items):
+    """Total quantity per product_id across order lines.
+
+    Legacy lines without a product have no stock to move and are skipped.
+    """
+    quantities = {}
+    for item in order_items:
+        if item['product_id'] is None:
+            continue
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    return quantities
+
+def adjust_stock(cursor, deltas):
+    """Take ``deltas[product_id]`` units out of stock (negative puts them back).
+
+    Each decrement is a conditional ``UPDATE ... WHERE qty >= n``, so two
+    checkouts racing for the last units cannot both succeed; the loser gets
+    InsufficientStock and its transaction is rolled back. Only the product
+    rows involved are locked, always in id order so concurrent orders over
+    the same products cannot deadlock.
+    """
+    for product_id in sorted(deltas):
+        delta = deltas[product_id]
+        if delta > 0:
+            cursor.execute("UPDATE products SET qty = qty - %s WHERE id = %s AND qty >= %s",
+                           (delta, product_id, delta))
+            if cursor.rowcount == 0:
+                cursor.execute("SELECT name, qty FROM products WHERE id = %s", (product_id,))
+                product = cursor.fetchone()
+                available = product['qty'] if product and product['qty'] else 0
+                name = product['name'] if product else f"product {product_id}"
+                raise InsufficientStock(f"Not enough stock for {name}: {available} left, {delta} requested")
+        elif delta < 0:
+            cursor.execute("UPDATE products SET qty = COALESCE(qty, 0) - %s WHERE id = %s", (delta, product_id))
+
+def lock_products(cursor, product_ids):
+    """Lock the given product rows, in id order.
+
+    Order writes take their locks in one order: the existing order row (edit
+    and delete), then its products, then the sales rollup rows. add_order
+    gets the product locks from adjust_stock; edit_order and delete_order
+    call this before record_sales touches the rollups, so none of them can
+    deadlock against each other.
+    """
+    ids = sorted({product_id for product_id in product_ids if product_id is not None})
+    if ids:
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"SELECT id FROM products WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE", tuple(ids))
+        cursor.fetchall()
+
+# --- Sales rollups ---
+# daily_sales, product_sales and customer_sales hold per-day totals so the
+# reports never scan order_items. Every order write applies its delta in the
+# same transaction; rebuild_sales_rollups() recomputes them from scratch.
+
+def record_sales(cursor, order_id, sign):
+    """Add (sign=1) or remove (sign=-1) one order's contribution to the rollups.
+
+    Reads the order as currently stored, so call it after writing a new
+    order and before changing or deleting an existing one.
+    """
+    cursor.execute("""
+        INSERT INTO daily_sales (sale_date, order_count, item_count, revenue)
+        SELECT DATE(o.order_date), %s,
+               %s * (SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE order_id = o.id),
+               %s * COALESCE(o.total, 0)
+        FROM orders o
+        WHERE o.id = %s
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + VALUES(order_count),
+            item_count = item_count + VALUES(item_count),
+            revenue = revenue + VALUES(revenue)
+    """, (sign, sign, sign, order_id))
+    cursor.execute("""
+        INSERT INTO product_sales (sale_date, product_id, quantity, revenue)
+        SELECT d.sale_date, d.product_id, d.quantity, d.revenue
+        FROM (
+            SELECT DATE(o.order_date) AS sale_date, oi.product_id,
+                   %s * SUM(oi.quantity) AS quantity, %s * SUM(oi.subtotal) AS revenue
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.id = %s AND oi.product_id IS NOT NULL
+            GROUP BY DATE(o.order_date), oi.product_id
+        ) d
+        ON DUPLICATE KEY UPDATE
+            quantity = quantity + VALUES(quantity),
+            revenue = revenue + VALUES(revenue)
+    """, (sign, sign, order_id))
+    cursor.execute("""
+        INSERT INTO customer_sales (sale_date, customer_id, order_count, revenue)
+        SELECT DATE(o.order_date), o.customer_id, %s, %s * COALESCE(o.total, 0)
+        FROM orders o
+        WHERE o.id = %s AND o.customer_id IS NOT NULL
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + VALUES(order_count),
+            revenue = revenue + VALUES(revenue)
+    """, (sign, sign, order_id))
+
+def rebuild_sales_rollups():
+    """Recompute every sales rollup from orders and order_items."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # READ COMMITTED so the aggregate reads do not lock orders
+            # against checkouts running meanwhile
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cursor.execute("DELETE FROM daily_sales")
+            cursor.execute("""
+                INSERT INTO daily_sales (sale_date, order_count, item_count, revenue)
+                SELECT DATE(o.order_date), COUNT(*), COALESCE(SUM(i.quantity), 0), COALESCE(SUM(o.total), 0)
+                FROM orders o
+                LEFT JOIN (
+                    SELECT order_id, SUM(quantity) AS quantity
+                    FROM order_items
+                    GROUP BY order_id
+                ) i ON i.order_id = o.id
+                GROUP BY DATE(o.order_date)
+            """)
+            cursor.execute("DELETE FROM product_sales")
+            cursor.execute("""
+                INSERT INTO product_sales (sale_date, product_id, quantity, revenue)
+                SELECT DATE(o.order_date), oi.product_id, SUM(oi.quantity), SUM(oi.subtotal)
+                FROM order_items oi
+                JOIN orders o ON o.id = oi.order_id
+                WHERE oi.product_id IS NOT NULL
+                GROUP BY DATE(o.order_date), oi.product_id
+            """)
+            cursor.execute("DELETE FROM customer_sales")
+            cursor.execute("""
+                INSERT INTO customer_sales (sale_date, customer_id, order_count, revenue)
+                SELECT DATE(o.order_date), o.customer_id, COUNT(*), COALESCE(SUM(o.total), 0)
+                FROM orders o
+                WHERE o.customer_id IS NOT NULL
+                GROUP BY DATE(o.order_date), o.customer_id
+            """)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            close_cursor(cursor)
+
+@app.cli.command('rebuild-sales')
+def rebuild_sales_command():
+    """Recompute the sales rollup tables."""
+    rebuild_sales_rollups()
+    print("Sales rollups rebuilt.")
 
 @app.route('/add_order', methods=['POST'])
 @login_required
@@ -676,232 +2864,450 @@ def add_order():
     product_ids = request.form.getlist('product_ids[]')
     quantities = request.form.getlist('quantities[]')
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        # Calculate total order amount
-        total = 0
-        order_items = []
-        
-        # Get product prices and calculate subtotals
-        for product_id, qty in zip(product_ids, quantities):
-            cursor.execute("SELECT price FROM products WHERE id=%s", (product_id,))
-            product = cursor.fetchone()
-            qty = int(qty)
-            subtotal = qty * product['price']
-            total += subtotal
-            order_items.append({
-                'product_id': product_id,
-                'quantity': qty,
-                'price': product['price'],
-                'subtotal': subtotal
-            })
-        
-        # Generate order code
-        order_code = f"ORD-{secrets.token_hex(4).upper()}"
-        
-        # Create the order
-        cursor.execute("""
-            INSERT INTO orders (customer_id, code, total) 
-            VALUES (%s, %s, %s)
-        """, (customer_id, order_code, total))
-        
-        order_id = cursor.lastrowid
-        
-        # Create order items
-        for item in order_items:
+        with transaction() as cursor:
+            # Get product prices in one query and calculate subtotals
+            order_items, total = build_order_items(cursor, product_ids, quantities)
+            
+            # Reserve the stock first; an oversell aborts the whole order
+            adjust_stock(cursor, item_quantities(order_items))
+            
+            # Generate order code
+            order_code = f"ORD-{secrets.token_hex(4).upper()}"
+            
+            # Create the order
             cursor.execute("""
-                INSERT INTO order_items (order_id, product_id, quantity, price, subtotal) 
-                VALUES (%s, %s, %s, %s, %s)
-            """, (order_id, item['product_id'], item['quantity'], item['price'], item['subtotal']))
+                INSERT INTO orders (customer_id, code, total) 
+                VALUES (%s, %s, %s)
+            """, (customer_id, order_code, total))
+            
+            order_id = cursor.lastrowid
+            
+            # Create order items
+            insert_order_items(cursor, order_id, order_items)
+            record_sales(cursor, order_id, 1)
         
-        conn.commit()
         flash('Order placed successfully!', 'success')
-    except mysql.connector.Error as err:
-        conn.rollback()
+    except (mysql.connector.Error, ValueError) as err:
         flash(f'Error placing order: {err}', 'danger')
-    finally:
-        cursor.close()
-        conn.close()
     
     return redirect(url_for('orders'))
 
 @app.route('/edit_order/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_order(id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
     if request.method == 'POST':
         customer_id = request.form['customer_id']
         product_ids = request.form.getlist('product_ids[]')
         quantities = request.form.getlist('quantities[]')
         
         try:
-            # Calculate total order amount
-            total = 0
-            order_items = []
-            
-            # Get product prices and calculate subtotals
-            for product_id, qty in zip(product_ids, quantities):
-                cursor.execute("SELECT price FROM products WHERE id=%s", (product_id,))
-                product = cursor.fetchone()
-                qty = int(qty)
-                subtotal = qty * product['price']
-                total += subtotal
-                order_items.append({
-                    'product_id': product_id,
-                    'quantity': qty,
-                    'price': product['price'],
-                    'subtotal': subtotal
-                })
-            
-            # Update the order
-            cursor.execute("""
-                UPDATE orders 
-                SET customer_id=%s, total=%s 
-                WHERE id=%s
-            """, (customer_id, total, id))
-            
-            # Delete existing order items
-            cursor.execute("DELETE FROM order_items WHERE order_id=%s", (id,))
-            
-            # Create new order items
-            for item in order_items:
+            with transaction() as cursor:
+                # Lock the order first, so the reads below see its current items
+                cursor.execute("SELECT id FROM orders WHERE id = %s FOR UPDATE", (id,))
+                cursor.fetchall()
+                
+                # Get product prices in one query and calculate subtotals
+                order_items, total = build_order_items(cursor, product_ids, quantities)
+                
+                # Lock every product the old and new items touch before the
+                # rollups, then take the old version out of them
+                cursor.execute("SELECT product_id FROM order_items WHERE order_id = %s", (id,))
+                lock_products(cursor, [row['product_id'] for row in cursor.fetchall()] +
+                              [item['product_id'] for item in order_items])
+                record_sales(cursor, id, -1)
+                
+                # Update the order
                 cursor.execute("""
-                    INSERT INTO order_items (order_id, product_id, quantity, price, subtotal) 
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (id, item['product_id'], item['quantity'], item['price'], item['subtotal']))
+                    UPDATE orders 
+                    SET customer_id=%s, total=%s 
+                    WHERE id=%s
+                """, (customer_id, total, id))
+                
+                # Apply only the differences to the existing order items, then
+                # move stock by the change in quantity per product
+                previous = item_quantities(sync_order_items(cursor, id, order_items))
+                requested = item_quantities(order_items)
+                adjust_stock(cursor, {
+                    product_id: requested.get(product_id, 0) - previous.get(product_id, 0)
+                    for product_id in set(previous) | set(requested)
+                })
+                record_sales(cursor, id, 1)
             
-            conn.commit()
             flash('Order updated successfully!', 'success')
             return redirect(url_for('orders'))
             
-        except mysql.connector.Error as err:
-            conn.rollback()
+        except (mysql.connector.Error, ValueError) as err:
             flash(f'Error updating order: {err}', 'danger')
             return redirect(url_for('edit_order', id=id))
 
     # GET request
-    # Get order details
-    cursor.execute("""
-        SELECT o.*, c.full_name as customer_name 
-        FROM orders o 
-        JOIN customers c ON o.customer_id = c.id 
-        WHERE o.id = %s
-    """, (id,))
-    order = cursor.fetchone()
-    
-    if not order:
-        cursor.close()
-        conn.close()
-        flash('Order not found!', 'danger')
-        return redirect(url_for('orders'))
-    
-    # Get order items
-    cursor.execute("""
-        SELECT oi.*, p.name as product_name 
-        FROM order_items oi 
-        JOIN products p ON oi.product_id = p.id 
-        WHERE oi.order_id = %s
-    """, (id,))
-    order_items = cursor.fetchall()
-    
-    # Get customers and products for dropdowns
-    cursor.execute("SELECT id, full_name FROM customers")
-    customers = cursor.fetchall()
-    
-    cursor.execute("SELECT id, name, price FROM products ORDER BY name")
-    products = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    with db_cursor() as cursor:
+        # Get order details
+        cursor.execute("""
+            SELECT o.*, c.full_name as customer_name 
+            FROM orders o 
+            JOIN customers c ON o.customer_id = c.id 
+            WHERE o.id = %s
+        """, (id,))
+        order = cursor.fetchone()
+        
+        if not order:
+            flash('Order not found!', 'danger')
+            return redirect(url_for('orders'))
+        
+        # Get order items; other customers and products are looked up as
+        # the user types
+        cursor.execute("""
+            SELECT oi.*, p.name as product_name, p.price as product_price
+            FROM order_items oi 
+            JOIN products p ON oi.product_id = p.id 
+            WHERE oi.order_id = %s
+        """, (id,))
+        order_items = cursor.fetchall()
     
     return render_template('edit_order.html', 
                          order=order, 
-                         order_items=order_items,
-                         customers=customers, 
-                         products=products)
+                         order_items=order_items)
 
 @app.route('/delete_order/<int:id>')
 @login_required
 def delete_order(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Delete order items first (should cascade, but let's be explicit)
-        cursor.execute("DELETE FROM order_items WHERE order_id=%s", (id,))
-        cursor.execute("DELETE FROM orders WHERE id=%s", (id,))
-        conn.commit()
+        with transaction() as cursor:
+            cursor.execute("SELECT id FROM orders WHERE id = %s FOR UPDATE", (id,))
+            cursor.fetchall()
+            # Put the order's items back in stock; this locks the products
+            # before record_sales locks the rollups
+            cursor.execute("SELECT product_id, quantity FROM order_items WHERE order_id = %s", (id,))
+            adjust_stock(cursor, {product_id: -quantity
+                                  for product_id, quantity in item_quantities(cursor.fetchall()).items()})
+            record_sales(cursor, id, -1)
+            # Delete order items first (should cascade, but let's be explicit)
+            cursor.execute("DELETE FROM order_items WHERE order_id=%s", (id,))
+            cursor.execute("DELETE FROM orders WHERE id=%s", (id,))
         flash('Order deleted successfully!', 'success')
     except mysql.connector.Error as err:
-        conn.rollback()
         flash(f'Error deleting order: {err}', 'danger')
-    finally:
-        cursor.close()
-        conn.close()
     return redirect(url_for('orders'))
 
 # Export orders as CSV
+EXPORT_CHUNK_SIZE = 1000
+
+def iter_csv_rows(rows):
+    """Encode an iterable of CSV rows as UTF-8 byte chunks, one per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for batch in rows:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 @app.route('/export_orders')
 @login_required
 def export_orders():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    cursor.execute("""
-        SELECT o.code, o.order_date, o.total, c.full_name as customer_name
-        FROM orders o
-        LEFT JOIN customers c ON o.customer_id = c.id
-        ORDER BY o.order_date DESC
-    """)
-    
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Order Code', 'Order Date', 'Customer Name', 'Total'])
-    
-    for order in orders:
-        writer.writerow([
+    customer_id = request.args.get('customer_id')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    search = request.args.get('search')
+    with_items = request.args.get('items') == '1'
+    compress = request.args.get('gzip') == '1'
+
+    # The connection outlives this function: it is released when the
+    # response is closed, after the last row has been streamed
+    resources = ExitStack()
+    try:
+        # Unbuffered cursor: rows are streamed from the server as we fetch them
+        cursor = resources.enter_context(db_cursor(buffered=False))
+        filters, params = build_order_filters(cursor, customer_id, start_date, end_date, search)
+    except Exception:
+        resources.close()
+        raise
+    where = " WHERE " + " AND ".join(filters) if filters else ""
+
+    if with_items:
+        header = ['Order Code', 'Order Date', 'Customer Name', 'Product', 'Quantity', 'Price', 'Subtotal', 'Order Total']
+        sql = f"""
+            SELECT o.code, o.order_date, o.total, c.full_name as customer_name,
+                   p.name as product_name, oi.quantity, oi.price, oi.subtotal
+            FROM orders o
+            LEFT JOIN customers c ON o.customer_id = c.id
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            LEFT JOIN products p ON oi.product_id = p.id
+            {where}
+            ORDER BY o.order_date DESC, o.id DESC, oi.id
+        """
+    else:
+        header = ['Order Code', 'Order Date', 'Customer Name', 'Total']
+        sql = f"""
+            SELECT o.code, o.order_date, o.total, c.full_name as customer_name
+            FROM orders o
+            LEFT JOIN customers c ON o.customer_id = c.id
+            {where}
+            ORDER BY o.order_date DESC, o.id DESC
+        """
+
+    def format_row(order):
+        row = [
             order['code'],
             order['order_date'].strftime('%Y-%m-%d %H:%M:%S') if order['order_date'] else '',
             order['customer_name'] or 'Unknown',
-            f"${order['total']:.2f}" if order['total'] else '$0.00'
-        ])
-    
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'orders_export_{time.strftime("%Y%m%d_%H%M%S")}.csv'
+        ]
+        if with_items:
+            row += [
+                order['product_name'] or '',
+                order['quantity'] if order['quantity'] is not None else '',
+                f"${order['price']:.2f}" if order['price'] is not None else '',
+                f"${order['subtotal']:.2f}" if order['subtotal'] is not None else '',
+            ]
+        row.append(f"${order['total']:.2f}" if order['total'] else '$0.00')
+        return row
+
+    try:
+        cursor.execute(sql, tuple(params))
+    except Exception:
+        resources.close()
+        raise
+
+    def row_batches():
+        yield [header]
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            yield [format_row(order) for order in rows]
+
+    body = iter_csv_rows(row_batches())
+    filename = f'orders_export_{time.strftime("%Y%m%d_%H%M%S")}.csv'
+    mimetype = 'text/csv'
+    if compress:
+        body = gzip_chunks(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
+    response.call_on_close(resources.close)
+    return response
 
 # API Endpoints for standalone index.html
+API_PRODUCTS_MAX_AGE = int(os.environ.get('API_PRODUCTS_MAX_AGE', 0))
+
+def json_payload(data):
+    """Serialize ``data`` once and return ``(etag, body)`` for conditional GETs."""
+    body = app.json.dumps(data).encode('utf-8')
+    return hashlib.sha256(body).hexdigest()[:32], body
+
+def conditional_json(etag, body):
+    """Build a cacheable JSON response, or a bare 304 if the client is current."""
+    # Weak comparison: the compression layer turns the ETag into W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_PRODUCTS_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response
+
+PRODUCT_FIELDS = ['id', 'code', 'name', 'qty', 'price', 'image_url', 'category']
+PRODUCT_SORT_FIELDS = ['name', 'price', 'category']
+MAX_PRODUCTS_PER_PAGE = 200
+
+def encode_product_cursor(product, sort_field):
+    """Encode a product's (sort value, id) position as an opaque page cursor."""
+    value = product[sort_field]
+    value = str(value) if value is not None else None
+    raw = json.dumps([value, product['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_product_cursor(value):
+    """Decode a product page cursor into (sort value, id); raises ValueError."""
+    try:
+        sort_value, product_id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        return sort_value, int(product_id)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+def keyset_clause(column, value, last_id, descending):
+    """WHERE clause selecting the rows after (value, last_id) in sort order.
+
+    MySQL sorts NULLs first ascending and last descending, so a NULL sort
+    value needs its own comparison.
+    """
+    if value is None:
+        if descending:
+            return f"({column} IS NULL AND p.id < %s)", [last_id]
+        return f"({column} IS NOT NULL OR p.id > %s)", [last_id]
+    if descending:
+        return f"({column} < %s OR ({column} = %s AND p.id < %s) OR {column} IS NULL)", [value, value, last_id]
+    return f"({column} > %s OR ({column} = %s AND p.id > %s))", [value, value, last_id]
+
+def parse_product_query(args):
+    """Validate the paging/projection arguments of GET /api/products."""
+    try:
+        limit = int(args['limit'])
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PRODUCTS_PER_PAGE:
+        raise ValueError(f'limit must be between 1 and {MAX_PRODUCTS_PER_PAGE}')
+
+    fields = ['id']
+    for field in args.get('fields', '').split(','):
+        field = field.strip()
+        if not field or field in fields:
+            continue
+        if field not in PRODUCT_FIELDS:
+            raise ValueError(f'Unknown field: {field}')
+        fields.append(field)
+    if len(fields) == 1:
+        fields = list(PRODUCT_FIELDS)
+
+    # Searches without an explicit sort are ordered by relevance
+    relevance = not args.get('sort')
+    sort = args.get('sort') or 'name'
+    descending = sort.startswith('-')
+    sort_field = sort.lstrip('-')
+    if sort_field not in PRODUCT_SORT_FIELDS:
+        raise ValueError(f'sort must be one of: {", ".join(PRODUCT_SORT_FIELDS)}')
+
+    after = decode_product_cursor(args['cursor']) if args.get('cursor') else None
+    return {
+        'limit': limit,
+        'fields': fields,
+        'sort_field': sort_field,
+        'descending': descending,
+        'relevance': relevance,
+        'category': args.get('category') or None,
+        'after': after,
+    }
+
+def load_product_page(cursor, query, search_query=''):
+    """Fetch one keyset-paginated page of products.
+
+    Searches without an explicit sort are ranked by relevance, best match
+    first. Returns the JSON payload with the projected products and the
+    cursor of the next page (None on the last page).
+    """
+    ranked = bool(search_query) and query['relevance']
+    sort_field = 'search_rank' if ranked else query['sort_field']
+    descending = ranked or query['descending']
+    sort_column = f"p.{sort_field}"
+    direction = "DESC" if descending else "ASC"
+    # The sort value is needed to build the next cursor even if not requested
+    select_fields = list(dict.fromkeys(query['fields'] + [query['sort_field']]))
+
+    filters = []
+    params = []
+    if query['category']:
+        filters.append("p.category = %s")
+        params.append(query['category'])
+    if search_query:
+        clause, search_params, rank, rank_params = search_clause(cursor, 'products', 'p', search_query)
+        filters.append(clause)
+        params.extend(search_params)
+
+    sql = f"SELECT {', '.join(f'p.{field}' for field in select_fields)} FROM products p"
+    if filters:
+        sql += " WHERE " + " AND ".join(filters)
+    if ranked:
+        # Rank in a derived table (also named p), so the keyset condition
+        # and ORDER BY can refer to the rank like to a column
+        sql = (f"SELECT * FROM (SELECT {', '.join(f'p.{field}' for field in select_fields)}, "
+               f"{rank} AS search_rank FROM products p WHERE {' AND '.join(filters)}) p")
+        params = rank_params + params
+        filters = []
+    if query['after']:
+        clause, keyset_params = keyset_clause(sort_column, query['after'][0], query['after'][1], descending)
+        sql += (" AND " if filters else " WHERE ") + clause
+        params.extend(keyset_params)
+    sql += f" ORDER BY {sort_column} {direction}, p.id {direction} LIMIT %s"
+    params.append(query['limit'] + 1)
+    cursor.execute(sql, tuple(params))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > query['limit']
+    rows = rows[:query['limit']]
+    next_cursor = encode_product_cursor(rows[-1], sort_field) if has_more else None
+    products = add_image_srcsets([{field: row[field] for field in query['fields']} for row in rows])
+    return {'success': True, 'products': products, 'next_cursor': next_cursor}
+
+def load_products_payload():
+    """Serialized full product list for the JSON API."""
+    return json_payload({'success': True, 'products': load_all_products()})
+
+def load_product_page_payload(query):
+    """Serialized page of products for the JSON API."""
+    with db_cursor() as cursor:
+        return json_payload(load_product_page(cursor, query))
+
+def search_product_page_payload(query, search_query):
+    """Serialized page of products matching a search."""
+    with db_cursor() as cursor:
+        return json_payload(load_product_page(cursor, query, search_query))
+
+def search_products_payload(search_query):
+    """Serialized list of every product matching a search, best match first."""
+    with db_cursor() as cursor:
+        clause, params, rank, rank_params = search_clause(cursor, 'products', 'p', search_query)
+        cursor.execute(f"SELECT * FROM products p WHERE {clause} ORDER BY {rank} DESC",
+                       tuple(params + rank_params))
+        return json_payload({'success': True, 'products': add_image_srcsets(cursor.fetchall())})
+
 @app.route('/api/products', methods=['GET'])
 def api_get_products():
+    """List products.
+
+    Without ``limit`` the whole catalog is returned, as older clients expect.
+    With ``limit`` the list is paginated: pass back ``next_cursor`` as
+    ``cursor`` for the next page. ``fields`` (comma separated), ``sort``
+    (name, price or category; prefix with ``-`` for descending) and
+    ``category`` narrow the result. ``search`` results are ordered by
+    relevance unless ``sort`` is given.
+    """
     search_query = request.args.get('search', '')
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+    limited = check_rate_limit(search_limiter if search_query else api_limiter)
+    if limited:
+        return limited
+
+    try:
+        query = parse_product_query(request.args) if 'limit' in request.args else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
     try:
-        if search_query:
-            cursor.execute("SELECT * FROM products WHERE name LIKE %s", (f'%{search_query}%',))
+        if query and not search_query:
+            # Pages are cached too; the key covers every argument that shapes them
+            key = ('page', query['limit'], tuple(query['fields']), query['sort_field'],
+                   query['descending'], query['category'], query['after'])
+            etag, body = catalog_cache.get(key, lambda: load_product_page_payload(query))
+        elif query:
+            key = ('page', search_query, query['limit'], tuple(query['fields']), query['sort_field'],
+                   query['descending'], query['relevance'], query['category'], query['after'])
+            etag, body = product_search_flight.do(key, lambda: search_product_page_payload(query, search_query))
+        elif search_query:
+            etag, body = product_search_flight.do(('all', search_query), lambda: search_products_payload(search_query))
         else:
-            cursor.execute("SELECT * FROM products")
-        
-        products = cursor.fetchall()
-        return jsonify({'success': True, 'products': products})
+            # The full catalog is cached already serialized, so a hit (and a
+            # matching If-None-Match) never touches MySQL or the JSON encoder
+            etag, body = catalog_cache.get('api', load_products_payload)
+        return conditional_json(etag, body)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/api/products', methods=['POST'])
 def api_add_product():
@@ -917,66 +3323,438 @@ def api_add_product():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Add timestamp to prevent filename conflicts
-                name_without_ext = os.path.splitext(filename)[0]
-                ext = os.path.splitext(filename)[1]
-                filename = f"{name_without_ext}_{int(time.time())}{ext}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_url = filename
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
+                # Stored under a hash of its content, so names never clash
+                image_url = save_image(file)
         
-        cursor.execute("""
-            INSERT INTO products (code, name, category, qty, price, image_url) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (code, name, category, qty, price, image_url))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction(dictionary=False) as cursor:
+            cursor.execute("""
+                INSERT INTO products (code, name, category, qty, price, image_url) 
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (code, name, category, qty, price, image_url))
+        products_changed()
         
         return jsonify({'success': True, 'message': 'Product added successfully'})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/products/<int:id>', methods=['DELETE'])
 def api_delete_product(id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get product info to delete image file
-        cursor.execute("SELECT image_url FROM products WHERE id = %s", (id,))
-        product = cursor.fetchone()
-        
-        if not product:
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Product not found'}), 404
-        
-        # Delete the product
-        cursor.execute("DELETE FROM products WHERE id = %s", (id,))
-        conn.commit()
+        with transaction() as cursor:
+            # Get product info to delete image file
+            cursor.execute("SELECT image_url FROM products WHERE id = %s", (id,))
+            product = cursor.fetchone()
+            
+            if not product:
+                return jsonify({'success': False, 'message': 'Product not found'}), 404
+            
+            # Delete the product
+            cursor.execute("DELETE FROM products WHERE id = %s", (id,))
+        products_changed()
         
         # Delete image file if it exists
-        if product['image_url']:
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], product['image_url'])
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        
-        cursor.close()
-        conn.close()
+        delete_image(product['image_url'])
         
         return jsonify({'success': True, 'message': 'Product deleted successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Sales reports, answered from the rollup tables
+REPORT_DEFAULT_DAYS = 30
+REPORT_MAX_TOP = 100
+# Expression giving the first day of the period each sale_date falls in
+REPORT_PERIODS = {
+    'day': "sale_date",
+    'week': "DATE_SUB(sale_date, INTERVAL WEEKDAY(sale_date) DAY)",
+    'month': "DATE_SUB(sale_date, INTERVAL DAYOFMONTH(sale_date) - 1 DAY)",
+}
+
+def parse_report_query(args):
+    """Validate the arguments of GET /api/reports."""
+    end = parse_date(args.get('end')) if args.get('end') else datetime.now()
+    start = parse_date(args.get('start')) if args.get('start') else end - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    if not start or not end:
+        raise ValueError('start and end must be YYYY-MM-DD')
+    if start > end:
+        raise ValueError('start must not be after end')
+    period = args.get('period', 'day')
+    if period not in REPORT_PERIODS:
+        raise ValueError(f'period must be one of: {", ".join(REPORT_PERIODS)}')
+    limit = int(args.get('limit', 10))
+    if not 1 <= limit <= REPORT_MAX_TOP:
+        raise ValueError(f'limit must be between 1 and {REPORT_MAX_TOP}')
+    return {'start': start.date(), 'end': end.date(), 'period': period, 'limit': limit}
+
+def load_sales_report(cursor, query):
+    """Revenue over time, top products and customers, and category mix."""
+    date_range = (query['start'], query['end'])
+    bucket = REPORT_PERIODS[query['period']]
+
+    cursor.execute(f"""
+        SELECT {bucket} AS period, SUM(order_count) AS orders, SUM(item_count) AS items, SUM(revenue) AS revenue
+        FROM daily_sales
+        WHERE sale_date >= %s AND sale_date <= %s
+        GROUP BY period
+        ORDER BY period
+    """, date_range)
+    revenue = cursor.fetchall()
+    # SUM() returns DECIMAL; counts are sent as plain integers
+    for row in revenue:
+        row['period'] = row['period'].isoformat()
+        row['orders'] = int(row['orders'])
+        row['items'] = int(row['items'])
+
+    cursor.execute("""
+        SELECT ps.product_id, p.name, p.category, SUM(ps.quantity) AS quantity, SUM(ps.revenue) AS revenue
+        FROM product_sales ps
+        LEFT JOIN products p ON p.id = ps.product_id
+        WHERE ps.sale_date >= %s AND ps.sale_date <= %s
+        GROUP BY ps.product_id, p.name, p.category
+        HAVING quantity <> 0
+        ORDER BY revenue DESC
+        LIMIT %s
+    """, date_range + (query['limit'],))
+    top_products = cursor.fetchall()
+    for row in top_products:
+        row['quantity'] = int(row['quantity'])
+
+    cursor.execute("""
+        SELECT cs.customer_id, c.full_name, SUM(cs.order_count) AS orders, SUM(cs.revenue) AS revenue
+        FROM customer_sales cs
+        LEFT JOIN customers c ON c.id = cs.customer_id
+        WHERE cs.sale_date >= %s AND cs.sale_date <= %s
+        GROUP BY cs.customer_id, c.full_name
+        HAVING orders <> 0
+        ORDER BY revenue DESC
+        LIMIT %s
+    """, date_range + (query['limit'],))
+    top_customers = cursor.fetchall()
+    for row in top_customers:
+        row['orders'] = int(row['orders'])
+
+    cursor.execute("""
+        SELECT COALESCE(p.category, 'Uncategorized') AS category, SUM(ps.quantity) AS quantity, SUM(ps.revenue) AS revenue
+        FROM product_sales ps
+        LEFT JOIN products p ON p.id = ps.product_id
+        WHERE ps.sale_date >= %s AND ps.sale_date <= %s
+        GROUP BY COALESCE(p.category, 'Uncategorized')
+        HAVING quantity <> 0
+        ORDER BY revenue DESC
+    """, date_range)
+    categories = cursor.fetchall()
+    category_revenue = sum(row['revenue'] for row in categories)
+    for row in categories:
+        row['quantity'] = int(row['quantity'])
+        row['share'] = round(float(row['revenue'] / category_revenue), 4) if category_revenue else None
+
+    return {
+        'success': True,
+        'start': query['start'].isoformat(),
+        'end': query['end'].isoformat(),
+        'period': query['period'],
+        'totals': {
+            'orders': sum(row['orders'] for row in revenue),
+            'items': sum(row['items'] for row in revenue),
+            'revenue': sum(row['revenue'] for row in revenue),
+        },
+        'revenue': revenue,
+        'top_products': top_products,
+        'top_customers': top_customers,
+        'categories': categories,
+    }
+
+@app.route('/api/reports', methods=['GET'])
+@login_required
+def api_reports():
+    """Sales dashboard data for ``start``..``end`` (inclusive, YYYY-MM-DD).
+
+    Defaults to the last 30 days. ``period`` (day, week or month) sets the
+    revenue buckets and ``limit`` the length of the top lists.
+    """
+    try:
+        query = parse_report_query(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        with db_cursor() as cursor:
+            return jsonify(load_sales_report(cursor, query))
+    except mysql.connector.Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# --- Bulk import ---
+# Products and customers can be loaded from a CSV file (with a header row)
+# or a JSONL file (one object per line), through POST /api/import/<table>
+# or `flask --app app import <table> <file>`. Rows are matched to existing
+# ones by code: matches are updated, the rest inserted. Only the columns
+# named in the CSV header (or the first JSONL record) are written. Every
+# IMPORT_CHUNK_SIZE valid rows go to MySQL as one multi-row statement in
+# their own transaction, so a failing chunk does not undo earlier ones.
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+# Errors listed in a report; 'failed' counts all of them
+IMPORT_MAX_ERRORS = 100
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+def text_field(max_length, required=False):
+    def parse(value):
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            if required:
+                raise ValueError('is required')
+            return None
+        if len(value) > max_length:
+            raise ValueError(f'is longer than {max_length} characters')
+        return value
+    return parse
+
+def qty_field(value):
+    if value is None or str(value).strip() == '':
+        return 0
+    try:
+        qty = int(str(value).strip())
+    except ValueError:
+        raise ValueError('must be a whole number')
+    if qty < 0:
+        raise ValueError('cannot be negative')
+    return qty
+
+def price_field(value):
+    try:
+        price = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError):
+        raise ValueError('must be a number')
+    if not Decimal(0) <= price < Decimal('100000000'):
+        raise ValueError('must be between 0 and 99999999.99')
+    return price
+
+def email_field(value):
+    email = text_field(100)(value)
+    if email and '@' not in email:
+        raise ValueError('is not an email address')
+    return email
+
+def gender_field(value):
+    gender = text_field(20)(value)
+    if gender and gender not in ('Male', 'Female', 'Other'):
+        raise ValueError('must be Male, Female or Other')
+    return gender
+
+# Importable columns per table; code comes first and is the match key
+IMPORT_FIELDS = {
+    'products': {
+        'code': text_field(50, required=True),
+        'name': text_field(100, required=True),
+        'qty': qty_field,
+        'price': price_field,
+        'category': text_field(100),
+    },
+    'customers': {
+        'code': text_field(50, required=True),
+        'full_name': text_field(100, required=True),
+        'phone': text_field(20),
+        'email': email_field,
+        'address': text_field(65535),
+        'gender': gender_field,
+    },
+}
+# Columns an import must include, since new rows need them
+IMPORT_REQUIRED = {'products': ['code', 'name', 'price'], 'customers': ['code', 'full_name']}
+
+def import_format(filename, fmt=None):
+    """The format to parse a file as: ``fmt`` if given, else its extension."""
+    fmt = (fmt or filename.rsplit('.', 1)[-1]).lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}'; use csv or jsonl")
+    return fmt
+
+def read_import_records(stream, fmt):
+    """Yield (line number, record) from a binary file; bad lines yield a ValueError."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError('is not valid JSON')
+            continue
+        yield line_number, record if isinstance(record, dict) else ValueError('is not a JSON object')
+
+class ImportReport:
+    def __init__(self, table, dry_run):
+        self.table = table
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.ignored_columns = []
+
+    def fail(self, line, message, rows=1):
+        """Count ``rows`` failed rows; the message is kept up to IMPORT_MAX_ERRORS."""
+        self.failed += rows
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def as_dict(self):
+        return {
+            'table': self.table,
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'ignored_columns': self.ignored_columns,
+        }
+
+def write_import_chunk(table, columns, chunk, report):
+    """Upsert one chunk of validated rows ({code key: (line, values)})."""
+    lines = [line for line, _ in chunk.values()]
+    failed_before = report.failed
+    placeholders = ", ".join(["%s"] * len(chunk))
+    try:
+        with (db_cursor() if report.dry_run else transaction()) as cursor:
+            # FOR UPDATE also locks the gaps where missing codes would go, so
+            # concurrent imports cannot both insert the same code
+            cursor.execute(f"SELECT id, code FROM {table} WHERE code IN ({placeholders})"
+                           + ("" if report.dry_run else " FOR UPDATE"),
+                           tuple(values[0] for _, values in chunk.values()))
+            existing = {}
+            for row in cursor.fetchall():
+                # Codes compare like the column collation: case-insensitive
+                existing.setdefault(row['code'].casefold().rstrip(), []).append(row['id'])
+            rows = []
+            for key, (line, values) in chunk.items():
+                ids = existing.get(key, [None])
+                if len(ids) > 1:
+                    report.fail(line, f"code {values[0]} matches {len(ids)} existing rows")
+                    continue
+                rows.append((ids[0],) + values)
+            if rows and not report.dry_run:
+                # New rows have no id and are inserted; the rest update by primary key
+                row_placeholders = "(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"
+                cursor.execute(f"""
+                    INSERT INTO {table} (id, {', '.join(columns)})
+                    VALUES {', '.join([row_placeholders] * len(rows))}
+                    ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in columns)}
+                """, tuple(value for row in rows for value in row))
+    except mysql.connector.Error as err:
+        # Every row of the chunk failed, including any already counted above
+        report.failed = failed_before
+        report.fail(min(lines), f"rows on lines {min(lines)}-{max(lines)} were not imported: {err.msg}", rows=len(chunk))
+        return
+    inserted = sum(1 for row in rows if row[0] is None)
+    report.inserted += inserted
+    report.updated += len(rows) - inserted
+
+def import_records(table, records, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validate and upsert ``(line, record)`` pairs into ``table``.
+
+    Raises ValueError if the columns do not allow an import at all;
+    problems with single rows are collected in the returned ImportReport.
+    """
+    fields = IMPORT_FIELDS[table]
+    report = ImportReport(table, dry_run)
+    columns = None
+    chunk = {}
+    for line, record in records:
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.fail(line, str(record))
+            continue
+        if columns is None:
+            columns = [column for column in fields if column in record]
+            missing = [column for column in IMPORT_REQUIRED[table] if column not in columns]
+            if missing:
+                raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+            report.ignored_columns = sorted(str(column) for column in record if column not in fields)
+        try:
+            values = []
+            for column in columns:
+                try:
+                    values.append(fields[column](record.get(column)))
+                except ValueError as e:
+                    raise ValueError(f"{column} {e}")
+        except ValueError as e:
+            report.fail(line, str(e))
+            continue
+        key = values[0].casefold().rstrip()
+        if key in chunk:
+            report.fail(chunk[key][0], f"code {values[0]} appears again on line {line}, which was used instead")
+        chunk[key] = (line, tuple(values))
+        if len(chunk) >= chunk_size:
+            write_import_chunk(table, columns, chunk, report)
+            chunk = {}
+    if chunk:
+        write_import_chunk(table, columns, chunk, report)
+    return report
+
+def import_file(table, stream, fmt, dry_run=False):
+    """Import a CSV/JSONL file into ``table``; returns the report as a dict."""
+    report = import_records(table, read_import_records(stream, fmt), dry_run)
+    if report.inserted or report.updated:
+        if table == 'products':
+            products_changed()
+        else:
+            customers_changed()
+    return report.as_dict()
+
+@app.route('/api/import/<table>', methods=['POST'])
+@login_required
+def api_import(table):
+    """Import an uploaded ``file``; pass ``dry_run=1`` to only validate it."""
+    if table not in IMPORT_FIELDS:
+        return jsonify({'success': False, 'message': f"Cannot import into {table}"}), 404
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'success': False, 'message': 'No file uploaded'}), 400
+    try:
+        fmt = import_format(file.filename, request.values.get('format'))
+        report = import_file(table, file.stream, fmt, request.values.get('dry_run') == '1')
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': report['failed'] == 0, 'report': report})
+
+@app.cli.command('import')
+@click.argument('table', type=click.Choice(sorted(IMPORT_FIELDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help="Validate and count without writing.")
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help="Defaults to the file extension.")
+def import_command(table, path, dry_run, fmt):
+    """Import products or customers from a CSV or JSONL file."""
+    started = time.monotonic()
+    try:
+        with open(path, 'rb') as f:
+            report = import_file(table, f, import_format(path, fmt), dry_run)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise click.ClickException(str(e))
+    for error in report['errors']:
+        print(f"line {error['line']}: {error['message']}")
+    if report['failed'] > len(report['errors']):
+        print(f"... and {report['failed'] - len(report['errors'])} more error(s)")
+    if report['ignored_columns']:
+        print(f"Ignored column(s): {', '.join(report['ignored_columns'])}")
+    verb = "Would insert" if dry_run else "Inserted"
+    print(f"{verb} {report['inserted']} and {'update' if dry_run else 'updated'} {report['updated']} {table} "
+          f"from {report['rows']} row(s), {report['failed']} failed, in {time.monotonic() - started:.1f}s.")
+    if report['failed']:
+        sys.exit(1)
+
 # Serve the standalone index.html file
 @app.route('/index.html')
 def serve_index():
-    return send_file('index.html')
+    return index_page.response(0)
 
 if __name__ == '__main__':
     app.run(debug=True)
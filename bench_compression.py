@@ -0,0 +1,72 @@
+"""Benchmark response compression on the heaviest pages.
+
+Requests each route through the Flask test client with no Accept-Encoding,
+with gzip and with brotli, and reports the bytes sent, server time, and the
+estimated time to deliver the response over a link of --mbps. Rate limits
+are turned off, since every request comes from one session. Needs the
+database from .env.
+
+Usage: python bench_compression.py [--runs 20] [--mbps 10] [route ...]
+"""
+
+import argparse
+import statistics
+import time
+
+from script_client import logged_in_client
+
+ROUTES = [
+    '/',
+    '/orders',
+    '/customers',
+    '/staff',
+    '/api/products',
+    '/api/products?limit=24',
+    '/export_orders',
+]
+
+ENCODINGS = [('identity', None), ('gzip', 'gzip'), ('br', 'br')]
+
+def measure(client, route, accept_encoding, runs):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    timings = []
+    statuses = set()
+    size = 0
+    encoding = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(route, headers=headers)
+        size = len(response.get_data())
+        timings.append((time.perf_counter() - started) * 1000)
+        encoding = response.headers.get('Content-Encoding')
+        statuses.add(response.status_code)
+        response.close()
+    return size, encoding, timings, statuses
+
+def bench(routes, runs, mbps):
+    client = logged_in_client()
+    bytes_per_ms = mbps * 1_000_000 / 8 / 1000
+    print(f"{'route':<28} {'encoding':<9} {'bytes':>9} {'ratio':>6} {'server ms':>10} {'p95 ms':>8} {'@' + str(mbps) + 'Mbps ms':>12}")
+    for route in routes:
+        baseline = None
+        for label, accept_encoding in ENCODINGS:
+            size, encoding, timings, statuses = measure(client, route, accept_encoding, runs)
+            if baseline is None:
+                baseline = size
+            if accept_encoding and encoding != accept_encoding:
+                label += '*'
+            server_ms = statistics.mean(timings)
+            p95_ms = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+            delivered_ms = server_ms + size / bytes_per_ms
+            flag = '' if all(200 <= status < 300 for status in statuses) else f"  HTTP {sorted(statuses)}"
+            print(f"{route:<28} {label:<9} {size:>9} {size / baseline if baseline else 1:>6.2f} "
+                  f"{server_ms:>10.2f} {p95_ms:>8.2f} {delivered_ms:>12.2f}{flag}")
+    print("\n* response was not compressed (below COMPRESS_MIN_SIZE, or not a compressible type)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare response size and latency with and without compression.")
+    parser.add_argument('routes', nargs='*', default=ROUTES)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--mbps', type=float, default=10, help="link speed used to estimate delivery time")
+    args = parser.parse_args()
+    bench(args.routes, args.runs, args.mbps)
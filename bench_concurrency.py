@@ -0,0 +1,139 @@
+"""Compare concurrent /api/products throughput of sync and threaded workers.
+
+Starts gunicorn once per worker setup on a local port and drives it with
+--clients concurrent clients for --duration seconds. Every request asks
+for a page of products matching a search term sampled from the database,
+so each one makes a MySQL round trip (searches are not cached). Reports
+throughput, p50/p95 latency and errors per setup:
+
+- sync: the previous default, one request at a time per worker
+- gthread: --threads request threads per worker (gunicorn.conf.py)
+
+Rate limits are turned off for the servers started here. Needs the
+database from .env.
+
+Usage: python bench_concurrency.py [--workers 2] [--threads 8] [--clients 32] [--duration 20] [--port 8765]
+"""
+
+import argparse
+import math
+import mysql.connector
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+db_config = {
+    "host": os.environ.get('DB_HOST', "127.0.0.1"),
+    "user": os.environ.get('DB_USER', "root"),
+    "password": os.environ.get('DB_PASSWORD', "123"),
+    "database": os.environ.get('DB_NAME', "skincare_shop")
+}
+
+STARTUP_TIMEOUT = 30
+REQUEST_TIMEOUT = 30
+
+def search_words():
+    """Words from product names, used as search terms."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT name FROM products WHERE name IS NOT NULL LIMIT 2000")
+        words = sorted({word for (name,) in cursor.fetchall() for word in name.split() if len(word) > 2})
+    finally:
+        cursor.close()
+        conn.close()
+    if not words:
+        raise SystemExit("No products found; run seed_data.py first.")
+    return words
+
+def start_server(port, workers, threads):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               RATE_LIMIT_SEARCH_RATE='0', RATE_LIMIT_API_RATE='0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', 'app:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {server.returncode}")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/products?limit=1', timeout=2).close()
+            return server
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit(f"gunicorn did not answer within {STARTUP_TIMEOUT}s")
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(len(values) * pct / 100) - 1)]
+
+def drive(port, words, clients, duration, seed):
+    """Run the clients; returns (latencies in ms, error count, elapsed seconds)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(rng):
+        while time.monotonic() < stop_at:
+            query = urllib.parse.urlencode({'limit': 24, 'search': rng.choice(words)})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/products?{query}',
+                                            timeout=REQUEST_TIMEOUT) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(random.Random(seed + i),)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0], time.monotonic() - started
+
+def bench(args):
+    words = search_words()
+    setups = [('sync', 1), (f'gthread x{args.threads}', args.threads)]
+    print(f"{args.workers} worker(s), {args.clients} clients, {args.duration}s per setup\n")
+    print(f"{'setup':<14} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for label, threads in setups:
+        server = start_server(args.port, args.workers, threads)
+        try:
+            latencies, errors, elapsed = drive(args.port, words, args.clients, args.duration, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{label:<14} {len(latencies):>9} {len(latencies) / elapsed:>8.1f} "
+              f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {errors:>7}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /api/products throughput of sync and threaded gunicorn workers.")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    bench(args)
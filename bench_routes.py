@@ -0,0 +1,232 @@
+"""Per-route micro-benchmarks through the Flask test client.
+
+Runs each of the main views in-process and records the wall time, the SQL
+statements it issued, the rows it fetched and its peak Python memory.
+Results are written to --output. When a baseline file exists the run is
+compared with it, and the script exits 1 if any route regressed:
+
+- its median time or peak memory grew by more than --threshold
+  (changes under --noise-ms or 64 KiB are ignored)
+- it issued more statements than before (catches N+1 query loops)
+- it fetched more than --threshold more rows
+
+Run it against the same seeded database each time (see seed_data.py), and
+record a baseline before the change you are testing with --save-baseline.
+The write routes work on a throwaway product and customer, which are
+removed again afterwards. Rate limits are turned off, since every request
+comes from one session. Needs the database from .env.
+
+Usage: python bench_routes.py [--runs 20] [--threshold 0.25] [--baseline bench_baseline.json]
+                              [--save-baseline] [--output bench_results.json] [route ...]
+"""
+
+import argparse
+import json
+import secrets
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import g
+
+# Imported first: it turns the rate limits off before app is loaded
+from script_client import logged_in_client
+from app import app, db_cursor, transaction, query_listener
+
+MEMORY_NOISE_KIB = 64
+
+class Recorder:
+    """Collects the RequestStats of the last request, including streamed bodies."""
+
+    def __init__(self):
+        self.stats = None
+        self.statements = 0
+
+    def teardown(self, exc):
+        # Runs when the request context is popped, after a streamed body
+        # has been sent, so export queries are included
+        self.stats = g.get('request_stats')
+
+recorder = Recorder()
+app.teardown_request(recorder.teardown)
+
+@query_listener
+def count_statement(sql, params, seconds):
+    recorder.statements += 1
+
+class Fixture:
+    """A throwaway customer, product and order for the write routes."""
+
+    def __init__(self, client):
+        self.client = client
+        tag = f"BENCH-{secrets.token_hex(3).upper()}"
+        with transaction() as cursor:
+            cursor.execute("INSERT INTO products (code, name, qty, price, category) VALUES (%s, %s, %s, %s, %s)",
+                           (tag, f"Benchmark {tag}", 1_000_000, 10, 'Benchmark'))
+            self.product_id = cursor.lastrowid
+            cursor.execute("INSERT INTO customers (full_name, code) VALUES (%s, %s)", (f"Benchmark {tag}", tag))
+            self.customer_id = cursor.lastrowid
+        self.client.post('/add_order', data=self.order_form())
+        with db_cursor() as cursor:
+            cursor.execute("SELECT id FROM orders WHERE customer_id = %s", (self.customer_id,))
+            self.order_id = cursor.fetchone()['id']
+            # A common word to search orders with
+            cursor.execute("SELECT full_name FROM customers WHERE full_name IS NOT NULL ORDER BY id LIMIT 1")
+            row = cursor.fetchone()
+            self.search_word = row['full_name'].split()[-1] if row else 'a'
+
+    def order_form(self):
+        return {'customer_id': self.customer_id, 'product_ids[]': [self.product_id], 'quantities[]': [1]}
+
+    def cleanup(self):
+        with db_cursor() as cursor:
+            cursor.execute("SELECT id FROM orders WHERE customer_id = %s", (self.customer_id,))
+            order_ids = [row['id'] for row in cursor.fetchall()]
+        for order_id in order_ids:
+            self.client.get(f'/delete_order/{order_id}')
+        with transaction() as cursor:
+            cursor.execute("DELETE FROM product_sales WHERE product_id = %s", (self.product_id,))
+            cursor.execute("DELETE FROM customer_sales WHERE customer_id = %s", (self.customer_id,))
+            cursor.execute("DELETE FROM products WHERE id = %s", (self.product_id,))
+            cursor.execute("DELETE FROM customers WHERE id = %s", (self.customer_id,))
+
+def routes(fixture):
+    """Benchmark name -> (method, path, form data)."""
+    month_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    return {
+        'orders': ('GET', '/orders', None),
+        'orders_200_per_page': ('GET', '/orders?per_page=200', None),
+        'order_search': ('GET', f'/orders/search?query={fixture.search_word}', None),
+        'customers': ('GET', '/customers', None),
+        'staff': ('GET', '/staff', None),
+        'api_get_products': ('GET', '/api/products', None),
+        'api_get_products_page': ('GET', '/api/products?limit=24', None),
+        'export_orders_30_days': ('GET', f'/export_orders?start_date={month_ago}', None),
+        'add_order': ('POST', '/add_order', fixture.order_form()),
+        'edit_order_form': ('GET', f'/edit_order/{fixture.order_id}', None),
+        'edit_order': ('POST', f'/edit_order/{fixture.order_id}', fixture.order_form()),
+    }
+
+def run_once(client, method, path, data):
+    """One request; returns (seconds, status, statements, rows)."""
+    recorder.stats = None
+    recorder.statements = 0
+    started = time.perf_counter()
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    response.close()
+    elapsed = time.perf_counter() - started
+    rows = recorder.stats.rows if recorder.stats else 0
+    return elapsed, response.status_code, recorder.statements, rows
+
+def measure(client, method, path, data, runs, warmup):
+    for _ in range(warmup):
+        run_once(client, method, path, data)
+    timings = []
+    statements = []
+    rows = []
+    statuses = set()
+    for _ in range(runs):
+        elapsed, status, count, fetched = run_once(client, method, path, data)
+        timings.append(elapsed * 1000)
+        statements.append(count)
+        rows.append(fetched)
+        statuses.add(status)
+
+    # Memory is measured on a separate run; tracing slows everything down
+    tracemalloc.start()
+    try:
+        run_once(client, method, path, data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[max(0, int(len(timings) * 0.95) - 1)], 3),
+        'statements': max(statements),
+        'rows': max(rows),
+        'peak_kib': round(peak / 1024, 1),
+        'statuses': sorted(statuses),
+    }
+
+def compare(results, baseline, threshold, noise_ms):
+    """List of regression messages of ``results`` against ``baseline``."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('routes', {}).get(name)
+        if not base:
+            continue
+        if (result['median_ms'] > base['median_ms'] * (1 + threshold)
+                and result['median_ms'] - base['median_ms'] > noise_ms):
+            regressions.append(f"{name}: median {base['median_ms']} -> {result['median_ms']} ms")
+        if result['statements'] > base['statements']:
+            regressions.append(f"{name}: {base['statements']} -> {result['statements']} SQL statements")
+        if result['rows'] > base['rows'] * (1 + threshold):
+            regressions.append(f"{name}: {base['rows']} -> {result['rows']} rows fetched")
+        if (result['peak_kib'] > base['peak_kib'] * (1 + threshold)
+                and result['peak_kib'] - base['peak_kib'] > MEMORY_NOISE_KIB):
+            regressions.append(f"{name}: peak memory {base['peak_kib']} -> {result['peak_kib']} KiB")
+    return regressions
+
+def bench(args):
+    client = logged_in_client()
+    fixture = Fixture(client)
+    try:
+        cases = routes(fixture)
+        selected = args.routes or list(cases)
+        unknown = [name for name in selected if name not in cases]
+        if unknown:
+            raise SystemExit(f"Unknown route(s): {', '.join(unknown)}. Choose from: {', '.join(cases)}")
+
+        print(f"{'route':<24} {'median ms':>10} {'p95 ms':>9} {'stmts':>6} {'rows':>8} {'peak KiB':>9}")
+        results = {}
+        for name in selected:
+            method, path, data = cases[name]
+            result = measure(client, method, path, data, args.runs, args.warmup)
+            results[name] = result
+            flag = '' if all(status < 400 for status in result['statuses']) else f"  HTTP {result['statuses']}"
+            print(f"{name:<24} {result['median_ms']:>10.2f} {result['p95_ms']:>9.2f} {result['statements']:>6} "
+                  f"{result['rows']:>8} {result['peak_kib']:>9.1f}{flag}")
+    finally:
+        fixture.cleanup()
+    return {'created_at': datetime.now().isoformat(timespec='seconds'), 'runs': args.runs, 'routes': results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the main routes in-process and check for regressions.")
+    parser.add_argument('routes', nargs='*')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative growth (0.25 = 25%%)")
+    parser.add_argument('--noise-ms', type=float, default=2, help="ignore median changes smaller than this")
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    report = bench(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved as baseline to {args.baseline}")
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        sys.exit(0)
+    regressions = compare(report['routes'], baseline, args.threshold, args.noise_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (created {baseline.get('created_at')}).")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,13 @@
+"""Gunicorn settings, read automatically when gunicorn starts in this directory.
+
+Each worker serves GUNICORN_THREADS requests at a time on threads, so a
+request waiting on MySQL no longer blocks the whole worker. The threads
+share the worker's connection pool (DB_POOL_SIZE), caches and limiters.
+GUNICORN_THREADS=1 brings back the plain sync worker.
+"""
+
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread' if threads > 1 else 'sync'
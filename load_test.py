@@ -0,0 +1,298 @@
+"""Mixed-traffic load test against a running instance of the app.
+
+Run the app the way production does, e.g.
+
+    gunicorn -w 4 -b 127.0.0.1:8000 app:app
+
+against a database filled by seed_data.py. Each virtual user logs in with
+its own session and loops over a weighted mix of browsing, searching and
+order placement for --duration seconds. The p50/p95/p99 latency,
+throughput and error rate of every route are printed and saved as JSON;
+pass --compare with the file of an earlier run to see what changed.
+
+Ids and search terms are sampled from the database in .env, which must be
+the one the app under test uses. Placed orders are real: they take stock
+and stay in the database (seed_data.py --clean does not remove them).
+
+Usage: python load_test.py [--url http://127.0.0.1:8000] [--users 16] [--duration 60]
+                           [--mix browse|checkout] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import http.cookiejar
+import json
+import math
+import mysql.connector
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+db_config = {
+    "host": os.environ.get('DB_HOST', "127.0.0.1"),
+    "user": os.environ.get('DB_USER', "root"),
+    "password": os.environ.get('DB_PASSWORD', "123"),
+    "database": os.environ.get('DB_NAME', "skincare_shop")
+}
+
+SAMPLE_SIZE = 5000
+REQUEST_TIMEOUT = 30
+
+# Route -> relative weight in each traffic mix
+MIXES = {
+    'browse': {
+        'orders page': 15, 'orders by customer': 5, 'orders by date': 5, 'order search': 8,
+        'order items': 5, 'customers page': 3, 'customer search': 8, 'staff page': 2,
+        'api products page': 15, 'api products search': 8, 'typeahead customers': 10,
+        'typeahead products': 10, 'add order': 6,
+    },
+    'checkout': {
+        'orders page': 10, 'typeahead customers': 20, 'typeahead products': 30, 'add order': 40,
+    },
+}
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Form posts answer with a redirect; its target is not part of the timing
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+def sample_data():
+    """Ids and search terms to build requests from."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        def sample(table, columns, where='1 = 1'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}")
+            step = max(1, cursor.fetchone()[0] // SAMPLE_SIZE)
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE {where} AND MOD(id, %s) = 0 LIMIT %s",
+                           (step, SAMPLE_SIZE))
+            return cursor.fetchall()
+
+        customers = sample('customers', 'id, full_name')
+        products = sample('products', 'id, name', 'qty > 100')
+        orders = sample('orders', 'id')
+        cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL LIMIT 50")
+        categories = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    if not customers or not products:
+        raise SystemExit("No customers or in-stock products found; run seed_data.py first.")
+    words = lambda rows: sorted({word for _, name in rows for word in (name or '').split() if len(word) > 2})
+    return {
+        'customer_ids': [row[0] for row in customers],
+        'customer_words': words(customers),
+        'product_ids': [row[0] for row in products],
+        'product_words': words(products),
+        'order_ids': [row[0] for row in orders],
+        'categories': categories,
+    }
+
+def build_request(route, rng, data):
+    """Return (method, path, form data or None) for one request of ``route``."""
+    if route == 'orders page':
+        return 'GET', '/orders', None
+    if route == 'orders by customer':
+        return 'GET', f"/orders?customer_id={rng.choice(data['customer_ids'])}", None
+    if route == 'orders by date':
+        start = datetime.now() - timedelta(days=rng.randint(1, 365))
+        end = start + timedelta(days=rng.choice([1, 7, 30]))
+        return 'GET', f"/orders?start_date={start:%Y-%m-%d}&end_date={end:%Y-%m-%d}", None
+    if route == 'order search':
+        return 'GET', '/orders/search?' + urllib.parse.urlencode({'query': rng.choice(data['customer_words'])}), None
+    if route == 'order items':
+        return 'GET', f"/api/orders/{rng.choice(data['order_ids'])}/items", None
+    if route == 'customers page':
+        return 'GET', '/customers', None
+    if route == 'customer search':
+        return 'GET', '/customers/search?' + urllib.parse.urlencode({'query': rng.choice(data['customer_words'])}), None
+    if route == 'staff page':
+        return 'GET', '/staff', None
+    if route == 'api products page':
+        params = {'limit': 24, 'sort': rng.choice(['name', 'price', '-price'])}
+        if data['categories'] and rng.random() < 0.5:
+            params['category'] = rng.choice(data['categories'])
+        return 'GET', '/api/products?' + urllib.parse.urlencode(params), None
+    if route == 'api products search':
+        return 'GET', '/api/products?' + urllib.parse.urlencode({'limit': 24, 'search': rng.choice(data['product_words'])}), None
+    if route in ('typeahead customers', 'typeahead products'):
+        kind = route.split()[1]
+        word = rng.choice(data['customer_words' if kind == 'customers' else 'product_words'])
+        # What a user has typed so far
+        return 'GET', f"/api/typeahead/{kind}?" + urllib.parse.urlencode({'q': word[:rng.randint(1, len(word))]}), None
+    if route == 'add order':
+        product_ids = rng.sample(data['product_ids'], min(len(data['product_ids']), rng.randint(1, 4)))
+        form = [('customer_id', rng.choice(data['customer_ids']))]
+        form += [('product_ids[]', product_id) for product_id in product_ids]
+        form += [('quantities[]', rng.randint(1, 3)) for _ in product_ids]
+        return 'POST', '/add_order', form
+    raise ValueError(f"Unknown route: {route}")
+
+class VirtualUser:
+    """One logged-in browser session."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+        self.login(username, password)
+
+    def send(self, method, path, form=None):
+        """Perform one request; returns the HTTP status (0 on a network error)."""
+        body = urllib.parse.urlencode(form).encode('utf-8') if form is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={'Accept-Encoding': 'gzip'})
+        try:
+            with self.opener.open(request, timeout=REQUEST_TIMEOUT) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+    def login(self, username, password):
+        form = [('username', username), ('password', password)]
+        if self.send('POST', '/login', form) == 302:
+            return
+        self.send('POST', '/register', form)
+        if self.send('POST', '/login', form) != 302:
+            raise SystemExit(f"Cannot log in to {self.base_url} as {username}")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples, elapsed):
+    """Per-route statistics from (route, status, seconds) samples."""
+    routes = {}
+    for route, status, seconds in samples:
+        routes.setdefault(route, []).append((status, seconds))
+    results = {}
+    for route, entries in sorted(routes.items()):
+        latencies = sorted(seconds * 1000 for _, seconds in entries)
+        # 3xx is how the form posts answer; anything else outside 2xx failed
+        errors = sum(1 for status, _ in entries if not 200 <= status < 400)
+        results[route] = {
+            'requests': len(entries),
+            'errors': errors,
+            'error_rate': round(errors / len(entries), 4),
+            'throughput_rps': round(len(entries) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+    return results
+
+def run(args):
+    data = sample_data()
+    mix = MIXES[args.mix]
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    print(f"Logging in {args.users} virtual users at {args.url}...")
+    users = [VirtualUser(args.url, args.username, args.password) for _ in range(args.users)]
+
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def loop(index, user):
+        rng = random.Random(args.seed + index)
+        mine = []
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            method, path, form = build_request(route, rng, data)
+            started = time.perf_counter()
+            status = user.send(method, path, form)
+            mine.append((route, status, time.perf_counter() - started))
+            if args.think_ms:
+                time.sleep(rng.expovariate(1000 / args.think_ms))
+        with lock:
+            samples.extend(mine)
+
+    print(f"Running the '{args.mix}' mix for {args.duration}s...")
+    started = time.monotonic()
+    threads = [threading.Thread(target=loop, args=(i, user)) for i, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    routes = summarize(samples, elapsed)
+    total = len(samples)
+    errors = sum(result['errors'] for result in routes.values())
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'url': args.url,
+        'mix': args.mix,
+        'users': args.users,
+        'duration_s': round(elapsed, 1),
+        'think_ms': args.think_ms,
+        'seed': args.seed,
+        'total': {
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else None,
+            'throughput_rps': round(total / elapsed, 2),
+        },
+        'routes': routes,
+    }
+
+def print_report(report, baseline=None):
+    print(f"\n{'route':<22} {'reqs':>7} {'err%':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'p95 vs base':>12}" if baseline else ''))
+    for route, result in report['routes'].items():
+        line = (f"{route:<22} {result['requests']:>7} {result['error_rate'] * 100:>6.2f} {result['throughput_rps']:>8.2f} "
+                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+        base = baseline['routes'].get(route) if baseline else None
+        if base:
+            line += f" {(result['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:>+11.1f}%"
+        print(line)
+    total = report['total']
+    print(f"\nTotal: {total['requests']} requests, {total['throughput_rps']} req/s, "
+          f"{(total['error_rate'] or 0) * 100:.2f}% errors")
+    if baseline:
+        print(f"Baseline: {baseline['total']['requests']} requests, {baseline['total']['throughput_rps']} req/s, "
+              f"{(baseline['total']['error_rate'] or 0) * 100:.2f}% errors")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running app with mixed traffic.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=16, help="concurrent virtual users")
+    parser.add_argument('--duration', type=int, default=60, help="seconds to run")
+    parser.add_argument('--mix', choices=MIXES, default='browse')
+    parser.add_argument('--think-ms', type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--output', help="where to save the JSON results (default loadtest-<time>.json)")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    output = args.output or f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+    sys.exit(1 if report['total']['errors'] else 0)
@@ -0,0 +1,217 @@
+"""Apply the versioned schema migrations in migrations/.
+
+Each migration is a file named ``NNNN_description.sql`` or
+``NNNN_description.py`` and runs once, in version order. Applied versions
+are recorded with a checksum in the ``schema_migrations`` table; editing a
+migration after it has been applied is reported as an error instead of
+silently diverging. When nothing is pending a run costs a single query.
+
+SQL files are split on ``;`` (keep semicolons out of string literals).
+Python files define ``upgrade(migrator)`` and should check the current
+schema before changing it, because MySQL commits DDL immediately and a
+failed migration cannot be rolled back.
+
+Usage: python migrate.py [--dry-run]
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import mysql.connector
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+db_config = {
+    "host": os.environ.get('DB_HOST', "127.0.0.1"),
+    "user": os.environ.get('DB_USER', "root"),
+    "password": os.environ.get('DB_PASSWORD', "123"),
+    "database": os.environ.get('DB_NAME', "skincare_shop")
+}
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# Seconds a migration waits for a metadata lock before giving up, so an
+# ALTER queued behind a long transaction does not stall every query behind it
+MIGRATION_LOCK_WAIT_TIMEOUT = int(os.environ.get('MIGRATION_LOCK_WAIT_TIMEOUT', 10))
+# Advisory lock that keeps two deploys from migrating at the same time
+MIGRATION_LOCK_NAME = 'skincare_shop.schema_migrations'
+ONLINE_DDL = "ALGORITHM=INPLACE, LOCK=NONE"
+
+# ER_ALTER_OPERATION_NOT_SUPPORTED and ER_ALTER_OPERATION_NOT_SUPPORTED_REASON
+ONLINE_DDL_UNSUPPORTED = (1845, 1846)
+ER_NO_SUCH_TABLE = 1146
+
+class MigrationError(Exception):
+    pass
+
+class Migration:
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        stem, self.kind = os.path.splitext(self.filename)
+        self.version, _, self.name = stem.partition('_')
+        with open(path, 'rb') as f:
+            self.source = f.read()
+        self.checksum = hashlib.sha256(self.source).hexdigest()
+
+    def statements(self):
+        """Statements of a .sql migration, without comments."""
+        lines = [line for line in self.source.decode('utf-8').splitlines()
+                 if not line.strip().startswith('--')]
+        return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+    def run(self, migrator):
+        if self.kind == '.sql':
+            for statement in self.statements():
+                migrator.execute(statement)
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{self.version}", self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(migrator)
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """All migration files, sorted by version."""
+    migrations = [Migration(os.path.join(directory, filename))
+                  for filename in os.listdir(directory)
+                  if filename[:1].isdigit() and filename.endswith(('.sql', '.py'))]
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    duplicates = {v for v in versions if versions.count(v) > 1}
+    if duplicates:
+        raise MigrationError(f"Duplicate migration version(s): {', '.join(sorted(duplicates))}")
+    return migrations
+
+class Migrator:
+    """Runs migrations over one connection; passed to Python migrations."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    def applied(self):
+        """Map of applied version -> checksum; creates the table on first use."""
+        try:
+            self.cursor.execute("SELECT version, checksum FROM schema_migrations")
+        except mysql.connector.Error as err:
+            if err.errno != ER_NO_SUCH_TABLE:
+                raise
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(20) PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    checksum CHAR(64) NOT NULL,
+                    execution_ms INT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            return {}
+        return dict(self.cursor.fetchall())
+
+    def execute(self, sql, params=None):
+        """Run one statement; ALTER TABLE is tried online first.
+
+        Operations InnoDB cannot do in place (FULLTEXT indexes, column type
+        changes) are retried with the default algorithm.
+        """
+        if sql.lstrip().upper().startswith('ALTER TABLE') and 'ALGORITHM' not in sql.upper():
+            try:
+                self.cursor.execute(f"{sql.rstrip()}, {ONLINE_DDL}", params)
+                return
+            except mysql.connector.Error as err:
+                if err.errno not in ONLINE_DDL_UNSUPPORTED:
+                    raise
+                print(f"  Online DDL not supported, using a locking ALTER: {err.msg}")
+        self.cursor.execute(sql, params)
+
+    def columns(self, table):
+        """Column name -> INFORMATION_SCHEMA.COLUMNS row for ``table``."""
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, (table,))
+            return {row['COLUMN_NAME']: row for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def indexes(self):
+        """Set of (table, index name) in the current database."""
+        self.cursor.execute("""
+            SELECT DISTINCT TABLE_NAME, INDEX_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+        """)
+        return set(self.cursor.fetchall())
+
+    def apply(self, migration):
+        started = time.monotonic()
+        migration.run(self)
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        self.cursor.execute(
+            "INSERT INTO schema_migrations (version, name, checksum, execution_ms) VALUES (%s, %s, %s, %s)",
+            (migration.version, migration.name, migration.checksum, elapsed_ms)
+        )
+        self.conn.commit()
+        return elapsed_ms
+
+def pending_migrations(migrations, applied):
+    """Migrations not yet applied; raises MigrationError on checksum drift."""
+    changed = [m.filename for m in migrations if m.version in applied and applied[m.version] != m.checksum]
+    if changed:
+        raise MigrationError(f"Applied migration(s) changed on disk: {', '.join(changed)}. "
+                             "Add a new migration instead of editing an applied one.")
+    return [m for m in migrations if m.version not in applied]
+
+def migrate(dry_run=False):
+    migrations = load_migrations()
+    conn = mysql.connector.connect(**db_config)
+    migrator = Migrator(conn)
+    try:
+        pending = pending_migrations(migrations, migrator.applied())
+        if not pending:
+            print(f"Schema is up to date ({len(migrations)} migration(s) applied).")
+            return True
+
+        if dry_run:
+            for migration in pending:
+                print(f"Pending: {migration.filename}")
+                if migration.kind == '.sql':
+                    for statement in migration.statements():
+                        print(f"  {statement.splitlines()[0]} ...")
+            return True
+
+        migrator.cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_WAIT_TIMEOUT * 6))
+        if migrator.cursor.fetchone()[0] != 1:
+            raise MigrationError("Another migration run holds the lock")
+        try:
+            migrator.cursor.execute("SET SESSION lock_wait_timeout = %s", (MIGRATION_LOCK_WAIT_TIMEOUT,))
+            # Another deploy may have finished while we waited for the lock
+            pending = pending_migrations(migrations, migrator.applied())
+            for migration in pending:
+                print(f"Applying {migration.filename} ...")
+                elapsed_ms = migrator.apply(migration)
+                print(f"  done in {elapsed_ms} ms")
+        finally:
+            migrator.cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            migrator.cursor.fetchall()
+        print(f"Applied {len(pending)} migration(s).")
+        return True
+    except (mysql.connector.Error, MigrationError) as err:
+        print(f"Error: {err}")
+        return False
+    finally:
+        migrator.cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument('--dry-run', action='store_true', help="list pending migrations without applying them")
+    args = parser.parse_args()
+    sys.exit(0 if migrate(dry_run=args.dry_run) else 1)
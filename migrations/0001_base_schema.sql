@@ -0,0 +1,60 @@
+-- Base tables. IF NOT EXISTS keeps this a no-op on databases created
+-- before the migration runner; later migrations bring those up to date.
+
+CREATE TABLE IF NOT EXISTS products (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(50),
+    name VARCHAR(100),
+    qty INT,
+    price DECIMAL(10,2),
+    image_url VARCHAR(255),
+    category VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    full_name VARCHAR(100),
+    code VARCHAR(50),
+    phone VARCHAR(20),
+    email VARCHAR(100),
+    address TEXT,
+    gender VARCHAR(20) DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS staff (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(50) UNIQUE,
+    full_name VARCHAR(100) NOT NULL,
+    position VARCHAR(100),
+    phone VARCHAR(20),
+    email VARCHAR(100) UNIQUE,
+    address TEXT,
+    profile_picture VARCHAR(255),
+    gender VARCHAR(20) DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(50),
+    customer_id INT,
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total DECIMAL(10,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT,
+    product_id INT,
+    quantity INT,
+    price DECIMAL(10,2),
+    subtotal DECIMAL(10,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (order_id) REFERENCES orders(id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL
+);
@@ -0,0 +1,77 @@
+"""Bring databases created by the old setup scripts up to the current columns.
+
+Replaces update_db.py (update_database, ensure_total_column, fix_null_totals,
+migrate_total_amount, update_schema) and verify_orders.py. Every step checks
+the current shape first, so it is safe on a database that is already current.
+"""
+
+def drop_foreign_keys_on(migrator, table, column):
+    migrator.cursor.execute("""
+        SELECT CONSTRAINT_NAME
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = %s
+        AND COLUMN_NAME = %s
+        AND REFERENCED_TABLE_NAME IS NOT NULL
+    """, (table, column))
+    for (constraint,) in migrator.cursor.fetchall():
+        migrator.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint}")
+
+def upgrade(migrator):
+    # Orders used to hold a single product; items now live in order_items
+    columns = migrator.columns('orders')
+    for column in ('product_id', 'qty'):
+        if column in columns:
+            drop_foreign_keys_on(migrator, 'orders', column)
+            migrator.execute(f"ALTER TABLE orders DROP COLUMN {column}")
+
+    if 'code' not in columns:
+        migrator.execute("ALTER TABLE orders ADD COLUMN code VARCHAR(50) AFTER id")
+    if 'order_date' not in columns:
+        migrator.execute("ALTER TABLE orders ADD COLUMN order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP AFTER customer_id")
+
+    # Standardize on 'total'
+    if 'total_amount' in columns and 'total' not in columns:
+        migrator.execute("ALTER TABLE orders CHANGE COLUMN total_amount total DECIMAL(10,2)")
+    elif 'total_amount' in columns:
+        migrator.execute("UPDATE orders SET total = total_amount WHERE total IS NULL AND total_amount IS NOT NULL")
+        migrator.execute("ALTER TABLE orders DROP COLUMN total_amount")
+    elif 'total' not in columns:
+        migrator.execute("ALTER TABLE orders ADD COLUMN total DECIMAL(10,2) NOT NULL DEFAULT 0")
+
+    item_columns = migrator.columns('order_items')
+    if 'subtotal' not in item_columns:
+        migrator.execute("ALTER TABLE order_items ADD COLUMN subtotal DECIMAL(10,2) NOT NULL DEFAULT 0")
+
+    # Backfill subtotals and the totals of orders that have items
+    migrator.execute("""
+        UPDATE order_items
+        SET subtotal = price * quantity
+        WHERE subtotal IS NULL OR subtotal = 0
+    """)
+    migrator.execute("""
+        UPDATE orders o
+        JOIN (
+            SELECT order_id, SUM(subtotal) AS total
+            FROM order_items
+            GROUP BY order_id
+        ) t ON t.order_id = o.id
+        SET o.total = t.total
+        WHERE o.total IS NULL OR o.total = 0
+    """)
+    migrator.execute("UPDATE orders SET total = 0 WHERE total IS NULL")
+
+    column = migrator.columns('orders')['total']
+    if column['COLUMN_TYPE'] != 'decimal(10,2)' or column['IS_NULLABLE'] == 'YES':
+        migrator.execute("ALTER TABLE orders MODIFY COLUMN total DECIMAL(10,2) NOT NULL DEFAULT 0")
+
+    # Columns skincareshop.sql used to add with bare ALTERs, and the ones
+    # setup_db.py added to products
+    for table, column, definition in [
+        ('customers', 'gender', 'VARCHAR(20) DEFAULT NULL'),
+        ('staff', 'gender', 'VARCHAR(20) DEFAULT NULL'),
+        ('products', 'image_url', 'VARCHAR(255)'),
+        ('products', 'category', 'VARCHAR(100)'),
+    ]:
+        if column not in migrator.columns(table):
+            migrator.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
@@ -0,0 +1,6 @@
+-- Shared version counters for the app's in-process caches
+-- (CATALOG_CACHE_BACKEND=mysql)
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
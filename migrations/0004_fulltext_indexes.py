@@ -0,0 +1,19 @@
+"""FULLTEXT indexes used by the search endpoints in app.py.
+
+The ngram parser lets partial words and codes match. Keep in sync with
+SEARCH_FIELDS in app.py.
+"""
+
+FULLTEXT_INDEXES = [
+    ('products', 'ft_products_search', 'name'),
+    ('customers', 'ft_customers_search', 'full_name, phone'),
+    ('staff', 'ft_staff_search', 'full_name, position'),
+    ('orders', 'ft_orders_search', 'code'),
+]
+
+def upgrade(migrator):
+    existing = migrator.indexes()
+    for table, index_name, columns in FULLTEXT_INDEXES:
+        if (table, index_name) not in existing:
+            # InnoDB builds one FULLTEXT index per statement
+            migrator.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {index_name} ({columns}) WITH PARSER ngram")
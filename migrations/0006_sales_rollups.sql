@@ -0,0 +1,54 @@
+-- Sales rollups behind /api/reports. app.py keeps them current on every
+-- order write; `flask --app app rebuild-sales` recomputes them from scratch.
+
+CREATE TABLE IF NOT EXISTS daily_sales (
+    sale_date DATE PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    item_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS product_sales (
+    sale_date DATE NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, product_id),
+    INDEX idx_product_sales_product (product_id)
+);
+
+CREATE TABLE IF NOT EXISTS customer_sales (
+    sale_date DATE NOT NULL,
+    customer_id INT NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, customer_id),
+    INDEX idx_customer_sales_customer (customer_id)
+);
+
+-- Backfill from the existing orders
+DELETE FROM daily_sales;
+INSERT INTO daily_sales (sale_date, order_count, item_count, revenue)
+SELECT DATE(o.order_date), COUNT(*), COALESCE(SUM(i.quantity), 0), COALESCE(SUM(o.total), 0)
+FROM orders o
+LEFT JOIN (
+    SELECT order_id, SUM(quantity) AS quantity
+    FROM order_items
+    GROUP BY order_id
+) i ON i.order_id = o.id
+GROUP BY DATE(o.order_date);
+
+DELETE FROM product_sales;
+INSERT INTO product_sales (sale_date, product_id, quantity, revenue)
+SELECT DATE(o.order_date), oi.product_id, SUM(oi.quantity), SUM(oi.subtotal)
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE oi.product_id IS NOT NULL
+GROUP BY DATE(o.order_date), oi.product_id;
+
+DELETE FROM customer_sales;
+INSERT INTO customer_sales (sale_date, customer_id, order_count, revenue)
+SELECT DATE(o.order_date), o.customer_id, COUNT(*), COALESCE(SUM(o.total), 0)
+FROM orders o
+WHERE o.customer_id IS NOT NULL
+GROUP BY DATE(o.order_date), o.customer_id;
@@ -0,0 +1,18 @@
+-- Background job queue (JOB_QUEUE_BACKEND=mysql), drained by
+-- `flask --app app worker`
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claim_token CHAR(32) DEFAULT NULL,
+    locked_at TIMESTAMP NULL DEFAULT NULL,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP NULL DEFAULT NULL,
+    INDEX idx_jobs_status_run_after (status, run_after),
+    INDEX idx_jobs_claim_token (claim_token)
+);
@@ -0,0 +1,15 @@
+"""Indexes on the code columns, used by the bulk import to match rows.
+
+Existing data may hold duplicate or empty codes, so they are not UNIQUE.
+"""
+
+CODE_INDEXES = [
+    ('products', 'idx_products_code', 'code'),
+    ('customers', 'idx_customers_code', 'code'),
+]
+
+def upgrade(migrator):
+    existing = migrator.indexes()
+    for table, index_name, columns in CODE_INDEXES:
+        if (table, index_name) not in existing:
+            migrator.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns})")
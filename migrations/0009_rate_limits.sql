@@ -0,0 +1,7 @@
+-- Token buckets shared by all workers (RATE_LIMIT_BACKEND=mysql)
+CREATE TABLE IF NOT EXISTS rate_limits (
+    bucket VARCHAR(191) PRIMARY KEY,
+    tokens DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    INDEX idx_rate_limits_updated_at (updated_at)
+);
@@ -0,0 +1,21 @@
+"""Logged-in Flask test clients for the benchmark and stress scripts.
+
+Importing this module imports app with the rate limits turned off, since
+the scripts send every request from one process.
+"""
+
+import os
+
+os.environ['RATE_LIMIT_SEARCH_RATE'] = '0'
+os.environ['RATE_LIMIT_API_RATE'] = '0'
+
+from app import app
+
+def logged_in_client(username='bench'):
+    """A test client with a logged-in session (no user row needed)."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['user_id'] = 0
+        session['username'] = username
+    return client
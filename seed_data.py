@@ -0,0 +1,295 @@
+"""Fill the database with a reproducible synthetic dataset for load testing.
+
+Generates products, customers, staff, and orders with their order_items
+at a chosen scale. Popular products and frequent customers follow a
+long-tail distribution, and order dates lean towards the recent past. The
+same --seed always produces the same rows, with dates counted back from
+the time of the run. Every generated row has a code starting with SEED-,
+so --clean removes exactly what this script added.
+
+Rows are written with multi-row INSERTs in --batch sized transactions.
+The sales rollups are rebuilt at the end. Restart the app afterwards so its
+in-process search indexes and caches pick up the new rows.
+
+Scales: small (1k products, 5k customers, ~60k order items),
+        medium (10k products, 100k customers, ~1M order items),
+        large (50k products, 1M customers, ~10M order items).
+
+Usage: python seed_data.py [--scale medium] [--products N] [--customers N]
+                           [--orders N] [--seed 42] [--days 365] [--clean]
+"""
+
+import argparse
+import math
+import mysql.connector
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+db_config = {
+    "host": os.environ.get('DB_HOST', "127.0.0.1"),
+    "user": os.environ.get('DB_USER', "root"),
+    "password": os.environ.get('DB_PASSWORD', "123"),
+    "database": os.environ.get('DB_NAME', "skincare_shop")
+}
+
+SCALES = {
+    'small': {'products': 1_000, 'customers': 5_000, 'staff': 20, 'orders': 20_000},
+    'medium': {'products': 10_000, 'customers': 100_000, 'staff': 50, 'orders': 330_000},
+    'large': {'products': 50_000, 'customers': 1_000_000, 'staff': 200, 'orders': 3_300_000},
+}
+CODE_PREFIX = 'SEED-'
+# Line items per order and how often each count occurs (mean ~3)
+ITEMS_PER_ORDER = [1, 2, 3, 4, 5, 6, 8]
+ITEMS_PER_ORDER_WEIGHTS = [20, 25, 20, 15, 10, 6, 4]
+
+BRANDS = ['Lumiere', 'Rosa Vie', 'Hanabi', 'Dew Lab', 'Petal & Co', 'Aqua Pure', 'Verdant', 'Silk Skin',
+          'Moonbloom', 'Nordic Leaf', 'Camellia', 'Pure Ritual', 'Seoul Glow', 'Oat & Honey', 'Bare Earth']
+LINES = ['Hydra', 'Calm', 'Bright', 'Youth', 'Clear', 'Barrier', 'Glow', 'Velvet', 'Daily', 'Intensive',
+         'Sensitive', 'Matte', 'Repair', 'Radiance', 'Balance']
+PRODUCT_TYPES = {
+    'Cleanser': ['Gel Cleanser', 'Foam Cleanser', 'Cleansing Oil', 'Micellar Water', 'Cleansing Balm'],
+    'Toner': ['Toner', 'Essence Toner', 'Exfoliating Toner', 'Mist'],
+    'Serum': ['Serum', 'Ampoule', 'Vitamin C Serum', 'Niacinamide Serum', 'Retinol Serum'],
+    'Moisturizer': ['Cream', 'Gel Cream', 'Lotion', 'Night Cream', 'Sleeping Mask'],
+    'Sunscreen': ['Sunscreen SPF 50', 'Sun Stick SPF 50', 'Tinted Sunscreen SPF 30'],
+    'Mask': ['Sheet Mask', 'Clay Mask', 'Peel-off Mask'],
+    'Eye Care': ['Eye Cream', 'Eye Serum', 'Eye Patches'],
+    'Lip Care': ['Lip Balm', 'Lip Mask', 'Lip Oil'],
+}
+SIZES = ['15ml', '30ml', '50ml', '100ml', '150ml', '200ml']
+PRICE_RANGES = {
+    'Cleanser': (8, 35), 'Toner': (10, 40), 'Serum': (15, 90), 'Moisturizer': (12, 75),
+    'Sunscreen': (10, 45), 'Mask': (3, 30), 'Eye Care': (15, 70), 'Lip Care': (4, 20),
+}
+FIRST_NAMES = ['Anh', 'Bao', 'Chi', 'Dung', 'Giang', 'Ha', 'Hoa', 'Huong', 'Khanh', 'Lan', 'Linh', 'Mai',
+               'Minh', 'My', 'Nga', 'Ngoc', 'Nhung', 'Phuong', 'Quynh', 'Thao', 'Trang', 'Tu', 'Van', 'Vy',
+               'Emma', 'Olivia', 'Sophia', 'Mia', 'Chloe', 'Grace', 'Lucas', 'Noah', 'Liam', 'Ethan', 'Leo']
+MIDDLE_NAMES = ['Thi', 'Van', 'Ngoc', 'Minh', 'Thu', 'Kim', 'Bich', 'Hong', 'Anne', 'Rose', 'Jay', '']
+LAST_NAMES = ['Nguyen', 'Tran', 'Le', 'Pham', 'Hoang', 'Huynh', 'Phan', 'Vu', 'Vo', 'Dang', 'Bui', 'Do',
+              'Ho', 'Ngo', 'Duong', 'Ly', 'Smith', 'Johnson', 'Brown', 'Kim', 'Park', 'Lee', 'Chen', 'Wong']
+STREETS = ['Le Loi', 'Nguyen Hue', 'Tran Hung Dao', 'Hai Ba Trung', 'Ly Thuong Kiet', 'Pasteur',
+           'Dien Bien Phu', 'Vo Van Tan', 'Nam Ky Khoi Nghia', 'Cach Mang Thang Tam']
+CITIES = ['Ho Chi Minh City', 'Ha Noi', 'Da Nang', 'Can Tho', 'Hai Phong', 'Nha Trang', 'Hue']
+POSITIONS = ['Sales Associate', 'Cashier', 'Store Manager', 'Beauty Advisor', 'Stock Clerk', 'Esthetician']
+EMAIL_DOMAINS = ['example.com', 'example.net', 'example.org']
+
+def long_tail_picker(rng, ids, skew=1.1):
+    """Pick from ``ids`` so that a few are chosen far more often than the rest."""
+    weights = [1 / (rank + 1) ** skew for rank in range(len(ids))]
+    # Popularity is independent of id order
+    ids = list(ids)
+    rng.shuffle(ids)
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return lambda k: rng.choices(ids, cum_weights=cumulative, k=k)
+
+def make_products(rng, count):
+    categories = list(PRODUCT_TYPES)
+    for n in range(1, count + 1):
+        category = rng.choice(categories)
+        low, high = PRICE_RANGES[category]
+        name = f"{rng.choice(BRANDS)} {rng.choice(LINES)} {rng.choice(PRODUCT_TYPES[category])} {rng.choice(SIZES)}"
+        price = round(rng.uniform(low, high), 2)
+        qty = rng.choice([0, 5, 20]) if rng.random() < 0.05 else rng.randint(50, 5000)
+        yield (f"{CODE_PREFIX}P{n:07d}", name, qty, price, None, category)
+
+def person(rng):
+    middle = rng.choice(MIDDLE_NAMES)
+    parts = [rng.choice(FIRST_NAMES), middle, rng.choice(LAST_NAMES)] if middle else [rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)]
+    return ' '.join(parts)
+
+def make_customers(rng, count):
+    for n in range(1, count + 1):
+        full_name = person(rng)
+        email = f"{full_name.lower().replace(' ', '.')}.{n}@{rng.choice(EMAIL_DOMAINS)}"
+        phone = f"0{rng.choice([3, 5, 7, 8, 9])}{rng.randint(0, 99_999_999):08d}"
+        address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+        yield (full_name, f"{CODE_PREFIX}C{n:07d}", phone, email, address, rng.choice(['Female'] * 4 + ['Male', 'Other']))
+
+def make_staff(rng, count):
+    for n in range(1, count + 1):
+        full_name = person(rng)
+        yield (f"{CODE_PREFIX}S{n:05d}", full_name, rng.choice(POSITIONS),
+               f"0{rng.choice([3, 7, 9])}{rng.randint(0, 99_999_999):08d}",
+               f"staff.{n}@{rng.choice(EMAIL_DOMAINS)}",
+               f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+               None, rng.choice(['Female', 'Male']))
+
+def make_orders(rng, count, first_id, customer_ids, products, days):
+    """Yield (order row, [item rows]) with explicit ids so items can reference them."""
+    pick_customers = long_tail_picker(rng, customer_ids, skew=0.8)
+    pick_products = long_tail_picker(rng, list(products), skew=1.1)
+    now = datetime.now().replace(microsecond=0)
+    span = days * 86400
+    for n in range(count):
+        order_id = first_id + n
+        # Square root of a uniform variate puts more orders in the recent past
+        order_date = now - timedelta(seconds=int(span * (1 - math.sqrt(rng.random()))))
+        lines = {}
+        for product_id in pick_products(rng.choices(ITEMS_PER_ORDER, ITEMS_PER_ORDER_WEIGHTS)[0]):
+            lines[product_id] = lines.get(product_id, 0) + rng.choice([1, 1, 1, 2, 2, 3])
+        items = []
+        total = 0
+        for product_id, quantity in lines.items():
+            price = products[product_id]
+            subtotal = round(price * quantity, 2)
+            total += subtotal
+            items.append((order_id, product_id, quantity, price, subtotal))
+        order = (order_id, f"{CODE_PREFIX}O{n + 1:08d}", pick_customers(1)[0], order_date, round(total, 2))
+        yield order, items
+
+def insert_batches(conn, sql, rows, batch_size, label):
+    """Insert ``rows`` with multi-row INSERTs, committing every ``batch_size`` rows."""
+    cursor = conn.cursor()
+    started = time.monotonic()
+    batch = []
+    inserted = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            inserted += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        inserted += len(batch)
+    cursor.close()
+    print(f"  {label}: {inserted} rows in {time.monotonic() - started:.1f}s")
+    return inserted
+
+def seeded_ids(cursor, table):
+    cursor.execute(f"SELECT id FROM {table} WHERE code LIKE %s ORDER BY id", (f"{CODE_PREFIX}%",))
+    return [row[0] for row in cursor.fetchall()]
+
+def clean(conn):
+    """Delete every row this script generated."""
+    cursor = conn.cursor()
+    pattern = f"{CODE_PREFIX}%"
+    statements = [
+        ('order_items', "DELETE oi FROM order_items oi JOIN orders o ON o.id = oi.order_id WHERE o.code LIKE %s"),
+        ('orders', "DELETE FROM orders WHERE code LIKE %s"),
+        # Orders placed through the app may use seeded customers and
+        # products; those rows are kept
+        ('customers', "DELETE c FROM customers c WHERE c.code LIKE %s "
+                      "AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.customer_id = c.id)"),
+        ('products', "DELETE p FROM products p WHERE p.code LIKE %s "
+                     "AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.product_id = p.id)"),
+        ('staff', "DELETE FROM staff WHERE code LIKE %s"),
+    ]
+    for table, sql in statements:
+        cursor.execute(sql, (pattern,))
+        print(f"  {table}: {cursor.rowcount} deleted")
+    conn.commit()
+    cursor.close()
+
+def seed(counts, seed_value, days, batch_size):
+    rng = random.Random(seed_value)
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM products WHERE code LIKE %s", (f"{CODE_PREFIX}%",))
+        if cursor.fetchone()[0]:
+            print("Seeded rows already exist; run with --clean first.")
+            return False
+        # Bulk-load settings for this session only
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+
+        print(f"Seeding with seed {seed_value}:")
+        insert_batches(conn, "INSERT INTO products (code, name, qty, price, image_url, category) VALUES (%s, %s, %s, %s, %s, %s)",
+                       make_products(rng, counts['products']), batch_size, 'products')
+        insert_batches(conn, "INSERT INTO customers (full_name, code, phone, email, address, gender) VALUES (%s, %s, %s, %s, %s, %s)",
+                       make_customers(rng, counts['customers']), batch_size, 'customers')
+        insert_batches(conn, "INSERT INTO staff (code, full_name, position, phone, email, address, profile_picture, gender) "
+                             "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                       make_staff(rng, counts['staff']), batch_size, 'staff')
+
+        cursor.execute("SELECT id, price FROM products WHERE code LIKE %s ORDER BY id", (f"{CODE_PREFIX}%",))
+        products = {product_id: float(price) for product_id, price in cursor.fetchall()}
+        customer_ids = seeded_ids(cursor, 'customers')
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM orders")
+        first_order_id = cursor.fetchone()[0]
+
+        # Orders and their items go in the same transactions
+        order_cursor = conn.cursor()
+        started = time.monotonic()
+        orders = []
+        items = []
+        placed = 0
+        item_count = 0
+        for order, order_items in make_orders(rng, counts['orders'], first_order_id, customer_ids, products, days):
+            orders.append(order)
+            items.extend(order_items)
+            if len(orders) >= batch_size:
+                order_cursor.executemany("INSERT INTO orders (id, code, customer_id, order_date, total) VALUES (%s, %s, %s, %s, %s)", orders)
+                order_cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity, price, subtotal) VALUES (%s, %s, %s, %s, %s)", items)
+                conn.commit()
+                placed += len(orders)
+                item_count += len(items)
+                orders, items = [], []
+                print(f"  orders: {placed}/{counts['orders']}", end='\r')
+        if orders:
+            order_cursor.executemany("INSERT INTO orders (id, code, customer_id, order_date, total) VALUES (%s, %s, %s, %s, %s)", orders)
+            order_cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity, price, subtotal) VALUES (%s, %s, %s, %s, %s)", items)
+            conn.commit()
+            placed += len(orders)
+            item_count += len(items)
+        order_cursor.close()
+        print(f"  orders: {placed} rows, order_items: {item_count} rows in {time.monotonic() - started:.1f}s")
+
+        print("Updating table statistics...")
+        cursor.execute("ANALYZE TABLE products, customers, staff, orders, order_items")
+        cursor.fetchall()
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+    rebuild_rollups()
+    return True
+
+def rebuild_rollups():
+    print("Rebuilding sales rollups...")
+    # Imported here: the app opens its connection pool on import
+    from app import rebuild_sales_rollups
+    rebuild_sales_rollups()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic dataset.")
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    for table in ('products', 'customers', 'staff', 'orders'):
+        parser.add_argument(f'--{table}', type=int, help=f"number of {table} (overrides --scale)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=365, help="spread order dates over this many past days")
+    parser.add_argument('--batch', type=int, default=5000, help="rows per INSERT batch and transaction")
+    parser.add_argument('--clean', action='store_true', help="delete previously seeded rows and exit")
+    args = parser.parse_args()
+
+    if args.clean:
+        conn = mysql.connector.connect(**db_config)
+        try:
+            print("Removing seeded rows:")
+            clean(conn)
+        finally:
+            conn.close()
+        rebuild_rollups()
+        sys.exit(0)
+
+    counts = dict(SCALES[args.scale])
+    for table in counts:
+        if getattr(args, table) is not None:
+            counts[table] = getattr(args, table)
+    sys.exit(0 if seed(counts, args.seed, args.days, args.batch) else 1)
@@ -1,3 +1,6 @@
+-- Reference snapshot of the full schema. Deployments are set up and
+-- upgraded with `python migrate.py`; schema changes go in migrations/.
+
 CREATE DATABASE skincare_shop;
 
 USE skincare_shop;
@@ -8,7 +11,12 @@ CREATE TABLE products (
     qty INT,
     price DECIMAL(10,2),
     image_url VARCHAR(255),
-    category VARCHAR(100)
+    category VARCHAR(100),
+    INDEX idx_products_name (name),
+    INDEX idx_products_category_name (category, name),
+    INDEX idx_products_price (price),
+    INDEX idx_products_code (code),
+    FULLTEXT INDEX ft_products_search (name) WITH PARSER ngram
 );
 
 CREATE TABLE customers (
@@ -18,7 +26,11 @@ CREATE TABLE customers (
     phone VARCHAR(20),
     email VARCHAR(100),
     address TEXT,
-    gender VARCHAR(20) DEFAULT NULL
+    gender VARCHAR(20) DEFAULT NULL,
+    INDEX idx_customers_full_name (full_name),
+    INDEX idx_customers_phone (phone),
+    INDEX idx_customers_code (code),
+    FULLTEXT INDEX ft_customers_search (full_name, phone) WITH PARSER ngram
 );
 
 CREATE TABLE staff (
@@ -30,7 +42,8 @@ CREATE TABLE staff (
     email VARCHAR(100) UNIQUE,
     address TEXT,
     profile_picture VARCHAR(255),
-    gender VARCHAR(20) DEFAULT NULL
+    gender VARCHAR(20) DEFAULT NULL,
+    FULLTEXT INDEX ft_staff_search (full_name, position) WITH PARSER ngram
 );
 
 CREATE TABLE IF NOT EXISTS orders (
@@ -39,7 +52,11 @@ CREATE TABLE IF NOT EXISTS orders (
     customer_id INT,
     order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     total DECIMAL(10,2),
-    FOREIGN KEY (customer_id) REFERENCES customers(id)
+    INDEX idx_orders_date_id (order_date, id),
+    INDEX idx_orders_customer_date (customer_id, order_date),
+    INDEX idx_orders_code (code),
+    FOREIGN KEY (customer_id) REFERENCES customers(id),
+    FULLTEXT INDEX ft_orders_search (code) WITH PARSER ngram
 );
 
 CREATE TABLE IF NOT EXISTS order_items (
@@ -49,6 +66,7 @@ CREATE TABLE IF NOT EXISTS order_items (
     quantity INT,
     price DECIMAL(10,2),
     subtotal DECIMAL(10,2),
+    INDEX idx_order_items_order_product (order_id, product_id),
     FOREIGN KEY (order_id) REFERENCES orders(id),
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
@@ -59,6 +77,64 @@ CREATE TABLE users (
     password_hash VARCHAR(255) NOT NULL
 );
 
+-- Shared version counters for the app's in-process caches
+CREATE TABLE cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Background job queue (JOB_QUEUE_BACKEND=mysql)
+CREATE TABLE jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claim_token CHAR(32) DEFAULT NULL,
+    locked_at TIMESTAMP NULL DEFAULT NULL,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP NULL DEFAULT NULL,
+    INDEX idx_jobs_status_run_after (status, run_after),
+    INDEX idx_jobs_claim_token (claim_token)
+);
+
+-- Token buckets shared by all workers (RATE_LIMIT_BACKEND=mysql)
+CREATE TABLE rate_limits (
+    bucket VARCHAR(191) PRIMARY KEY,
+    tokens DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    INDEX idx_rate_limits_updated_at (updated_at)
+);
+
+-- Sales rollups behind /api/reports, maintained by the order routes
+CREATE TABLE daily_sales (
+    sale_date DATE PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    item_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE product_sales (
+    sale_date DATE NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, product_id),
+    INDEX idx_product_sales_product (product_id)
+);
+
+CREATE TABLE customer_sales (
+    sale_date DATE NOT NULL,
+    customer_id INT NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, customer_id),
+    INDEX idx_customer_sales_customer (customer_id)
+);
+
 ALTER TABLE customers ADD COLUMN gender VARCHAR(20) DEFAULT NULL;
 ALTER TABLE staff ADD COLUMN gender VARCHAR(20) DEFAULT NULL;
 
@@ -0,0 +1,188 @@
+// Fetch-as-you-type lookups for the order forms.
+//
+// Markup:
+//   <div class="typeahead" data-url="/api/typeahead/customers" data-kind="customers">
+//       <input type="text" class="typeahead-input" autocomplete="off">
+//       <input type="hidden" name="customer_id">
+//       <div class="typeahead-menu list-group"></div>
+//   </div>
+//
+// Picking an entry stores its id (and data-price for products) on the hidden
+// input and fires a bubbling "change" event on it. Listeners are delegated,
+// so cloned rows work without extra setup.
+const Typeahead = (() => {
+    const DEBOUNCE_MS = 200;
+    const cache = new Map();
+
+    const formats = {
+        customers: {
+            text: customer => customer.full_name,
+            label: customer => customer.phone ? `${customer.full_name} · ${customer.phone}` : customer.full_name,
+        },
+        products: {
+            text: product => product.name,
+            label: product => `${product.name} - $${parseFloat(product.price).toFixed(2)} (${product.qty} in stock)`,
+        },
+    };
+
+    function parts(element) {
+        const box = element.closest('.typeahead');
+        return {
+            box,
+            input: box.querySelector('.typeahead-input'),
+            hidden: box.querySelector('input[type="hidden"]'),
+            menu: box.querySelector('.typeahead-menu'),
+        };
+    }
+
+    function validate(input, hidden) {
+        const missing = !hidden.value && (input.required || input.value.trim() !== '');
+        input.setCustomValidity(missing ? 'Choose an entry from the list.' : '');
+    }
+
+    function close(menu) {
+        menu.replaceChildren();
+    }
+
+    function render(box, results) {
+        const { menu } = parts(box);
+        const format = formats[box.dataset.kind];
+        box.results = results;
+        menu.replaceChildren(...results.map((result, index) => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action';
+            item.dataset.index = index;
+            item.textContent = format.label(result);
+            return item;
+        }));
+        if (!results.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted';
+            empty.textContent = 'No matches';
+            menu.appendChild(empty);
+        }
+    }
+
+    function lookup(box) {
+        const { input } = parts(box);
+        const params = new URLSearchParams({ q: input.value.trim() });
+        const url = `${box.dataset.url}?${params}`;
+        if (cache.has(url)) {
+            render(box, cache.get(url));
+            return;
+        }
+        // Only the latest keystroke's response is rendered
+        if (box.controller) {
+            box.controller.abort();
+        }
+        box.controller = new AbortController();
+        fetch(url, { signal: box.controller.signal })
+            .then(response => response.json().then(data => ({ ok: response.ok, data })))
+            .then(({ ok, data }) => {
+                const results = data[box.dataset.kind] || [];
+                // Errors such as 429 (too many lookups) are not cached
+                if (ok) {
+                    cache.set(url, results);
+                }
+                if (document.activeElement === input) {
+                    render(box, results);
+                }
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Typeahead lookup failed:', error);
+                }
+            });
+    }
+
+    function select(box, index) {
+        const { input, hidden, menu } = parts(box);
+        const result = box.results[index];
+        input.value = formats[box.dataset.kind].text(result);
+        hidden.value = result.id;
+        if (result.price !== undefined) {
+            hidden.dataset.price = result.price;
+        }
+        validate(input, hidden);
+        close(menu);
+        hidden.dispatchEvent(new Event('change', { bubbles: true }));
+    }
+
+    function move(menu, step) {
+        const items = [...menu.querySelectorAll('[data-index]')];
+        if (!items.length) {
+            return;
+        }
+        const current = items.findIndex(item => item.classList.contains('active'));
+        const next = (current + step + items.length) % items.length;
+        items.forEach(item => item.classList.remove('active'));
+        items[next].classList.add('active');
+        items[next].scrollIntoView({ block: 'nearest' });
+    }
+
+    document.addEventListener('input', event => {
+        if (!event.target.matches('.typeahead-input')) {
+            return;
+        }
+        const { box, input, hidden } = parts(event.target);
+        if (hidden.value) {
+            hidden.value = '';
+            delete hidden.dataset.price;
+            hidden.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+        validate(input, hidden);
+        clearTimeout(box.timer);
+        box.timer = setTimeout(() => lookup(box), DEBOUNCE_MS);
+    });
+
+    document.addEventListener('focusin', event => {
+        if (event.target.matches('.typeahead-input') && !event.target.value) {
+            lookup(parts(event.target).box);
+        }
+    });
+
+    document.addEventListener('focusout', event => {
+        if (event.target.matches('.typeahead-input')) {
+            // Let a click on a menu entry land first
+            const { menu } = parts(event.target);
+            setTimeout(() => close(menu), 150);
+        }
+    });
+
+    document.addEventListener('keydown', event => {
+        if (!event.target.matches('.typeahead-input')) {
+            return;
+        }
+        const { box, menu } = parts(event.target);
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            move(menu, event.key === 'ArrowDown' ? 1 : -1);
+        } else if (event.key === 'Enter' && menu.querySelector('.active')) {
+            event.preventDefault();
+            select(box, menu.querySelector('.active').dataset.index);
+        } else if (event.key === 'Escape') {
+            close(menu);
+        }
+    });
+
+    document.addEventListener('mousedown', event => {
+        const item = event.target.closest('.typeahead-menu [data-index]');
+        if (item) {
+            event.preventDefault();
+            select(item.closest('.typeahead'), item.dataset.index);
+        }
+    });
+
+    // Empty a (cloned) typeahead
+    function reset(box) {
+        const { input, hidden, menu } = parts(box);
+        input.value = '';
+        input.setCustomValidity('');
+        hidden.value = '';
+        delete hidden.dataset.price;
+        close(menu);
+    }
+
+    return { reset };
+})();
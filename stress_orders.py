@@ -0,0 +1,157 @@
+"""Concurrency stress test for stock reservation in add_order.
+
+Creates a throwaway product with a known stock, fires many parallel
+add_order requests at it through the Flask test client, and checks that
+stock never went negative and that exactly the units in stock were sold.
+A second round mixes new orders with edits and deletes of the placed ones,
+all for the same product and day, and checks that none of them deadlocked
+and that stock and the sales rollups still add up. The orders are then
+removed through delete_order, which must put every unit back. Needs the
+database from .env; exits 1 on any inconsistency.
+
+Usage: python stress_orders.py [--orders 200] [--workers 32] [--stock 50] [--qty 1]
+"""
+
+import argparse
+import random
+import secrets
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from script_client import logged_in_client
+from app import db_cursor, transaction
+
+def order_form(customer_id, product_id, qty):
+    return {'customer_id': customer_id, 'product_ids[]': [product_id], 'quantities[]': [qty]}
+
+def flashed_errors(client):
+    """Error messages the last request flashed."""
+    with client.session_transaction() as session:
+        return [message for category, message in session.pop('_flashes', []) if category == 'danger']
+
+def place_order(customer_id, product_id, qty):
+    client = logged_in_client('stress-test')
+    client.post('/add_order', data=order_form(customer_id, product_id, qty))
+    return flashed_errors(client)
+
+def mixed_request(job):
+    """Run one ('add' | 'edit' | 'delete', ...) job; returns its flashed errors."""
+    kind, customer_id, product_id, order_id, qty = job
+    client = logged_in_client('stress-test')
+    if kind == 'add':
+        client.post('/add_order', data=order_form(customer_id, product_id, qty))
+    elif kind == 'edit':
+        client.post(f'/edit_order/{order_id}', data=order_form(customer_id, product_id, qty))
+    else:
+        client.get(f'/delete_order/{order_id}')
+    return flashed_errors(client)
+
+def unexpected(errors):
+    # Running out of stock is expected; anything else (e.g. a 1213 deadlock) is not
+    return [error for error in errors if 'Not enough stock' not in error]
+
+def stock_totals(product_id):
+    """(units in stock, units in order items, units in product_sales) of a product."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT qty FROM products WHERE id = %s", (product_id,))
+        remaining = cursor.fetchone()['qty']
+        cursor.execute("SELECT COALESCE(SUM(quantity), 0) AS sold FROM order_items WHERE product_id = %s",
+                       (product_id,))
+        sold = cursor.fetchone()['sold']
+        cursor.execute("SELECT COALESCE(SUM(quantity), 0) AS rolled_up FROM product_sales WHERE product_id = %s",
+                       (product_id,))
+        rolled_up = cursor.fetchone()['rolled_up']
+    return remaining, sold, rolled_up
+
+def stress(orders, workers, stock, qty):
+    tag = f"STRESS-{secrets.token_hex(3).upper()}"
+    with transaction() as cursor:
+        cursor.execute("INSERT INTO products (code, name, qty, price, category) VALUES (%s, %s, %s, %s, %s)",
+                       (tag, f"Stress test {tag}", stock, 1, 'Stress'))
+        product_id = cursor.lastrowid
+        cursor.execute("INSERT INTO customers (full_name, code) VALUES (%s, %s)", (f"Stress test {tag}", tag))
+        customer_id = cursor.lastrowid
+
+    print(f"Placing {orders} orders of {qty} unit(s) with {workers} workers against a stock of {stock}...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = [error for result in pool.map(lambda _: place_order(customer_id, product_id, qty), range(orders))
+                  for error in result]
+
+    failures = [f"add_order failed: {error}" for error in unexpected(errors)]
+    with db_cursor() as cursor:
+        cursor.execute("SELECT qty FROM products WHERE id = %s", (product_id,))
+        remaining = cursor.fetchone()['qty']
+        cursor.execute("""
+            SELECT COUNT(DISTINCT oi.order_id) AS placed, COALESCE(SUM(oi.quantity), 0) AS sold
+            FROM order_items oi
+            WHERE oi.product_id = %s
+        """, (product_id,))
+        result = cursor.fetchone()
+        cursor.execute("SELECT id FROM orders WHERE customer_id = %s", (customer_id,))
+        order_ids = [row['id'] for row in cursor.fetchall()]
+
+    expected = min(orders, stock // qty)
+    print(f"Placed {result['placed']} order(s), sold {result['sold']} unit(s), {remaining} left in stock.")
+    if remaining < 0:
+        failures.append(f"stock went negative: {remaining}")
+    if result['sold'] + remaining != stock:
+        failures.append(f"sold {result['sold']} + remaining {remaining} != initial stock {stock}")
+    if result['placed'] != expected:
+        failures.append(f"expected {expected} successful orders, got {result['placed']}")
+    if len(order_ids) != result['placed']:
+        failures.append(f"{len(order_ids)} order rows but {result['placed']} with items")
+
+    # Edit half of the orders (doubling their quantity) and delete the
+    # rest, while as many new orders compete for the freed stock
+    jobs = [('edit' if i % 2 else 'delete', customer_id, product_id, order_id, qty * 2)
+            for i, order_id in enumerate(order_ids)]
+    jobs += [('add', customer_id, product_id, None, qty)] * len(order_ids)
+    random.Random(1).shuffle(jobs)
+    print(f"Running {len(jobs)} mixed adds, edits and deletes with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = [error for result in pool.map(mixed_request, jobs) for error in result]
+    failures += [f"mixed round: {error}" for error in unexpected(errors)]
+    remaining, sold, rolled_up = stock_totals(product_id)
+    print(f"After the mixed round: sold {sold} unit(s), {remaining} left in stock.")
+    if remaining < 0:
+        failures.append(f"stock went negative in the mixed round: {remaining}")
+    if sold + remaining != stock:
+        failures.append(f"mixed round: sold {sold} + remaining {remaining} != initial stock {stock}")
+    if rolled_up != sold:
+        failures.append(f"mixed round: product_sales has {rolled_up} unit(s), order items {sold}")
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id FROM orders WHERE customer_id = %s", (customer_id,))
+        order_ids = [row['id'] for row in cursor.fetchall()]
+
+    print(f"Deleting {len(order_ids)} order(s) with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = [error for result in pool.map(lambda order_id: mixed_request(('delete', None, None, order_id, None)),
+                                               order_ids) for error in result]
+    failures += [f"delete_order failed: {error}" for error in errors]
+
+    with transaction() as cursor:
+        cursor.execute("SELECT qty FROM products WHERE id = %s", (product_id,))
+        restored = cursor.fetchone()['qty']
+        if restored != stock:
+            failures.append(f"stock after deleting the orders is {restored}, expected {stock}")
+        cursor.execute("DELETE FROM orders WHERE customer_id = %s", (customer_id,))
+        # The rollups are back at zero for these rows; drop them
+        cursor.execute("DELETE FROM product_sales WHERE product_id = %s", (product_id,))
+        cursor.execute("DELETE FROM customer_sales WHERE customer_id = %s", (customer_id,))
+        cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+        cursor.execute("DELETE FROM customers WHERE id = %s", (customer_id,))
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("OK   no oversell, no lost units, no deadlocks.")
+    return not failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress add_order with parallel checkouts of one product.")
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=50)
+    parser.add_argument('--qty', type=int, default=1)
+    args = parser.parse_args()
+    sys.exit(0 if stress(args.orders, args.workers, args.stock, args.qty) else 1)
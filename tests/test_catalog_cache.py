@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+
+import app
+
+
+class FakeCursor:
+    def execute(self, sql, params=None):
+        self.params = params
+
+    def fetchall(self):
+        return [{'id': 1, 'name': self.params[0], 'price': 1, 'qty': 1}]
+
+
+@contextmanager
+def fake_cursor():
+    yield FakeCursor()
+
+
+def test_typeahead_does_not_evict_api_products(monkeypatch):
+    monkeypatch.setattr(app, 'db_cursor', fake_cursor)
+    app.catalog_cache.invalidate()
+    loads = []
+    app.catalog_cache.get('api', lambda: loads.append(1) or ['payload'])
+
+    for i in range(app.CATALOG_CACHE_MAX_ENTRIES * 2):
+        app.lookup_products(f'prefix{i}', 10)
+
+    assert app.catalog_cache.get('api', lambda: loads.append(1) or ['reloaded']) == ['payload']
+    assert loads == [1]
+    assert len(app.product_typeahead_cache.entries) <= app.TYPEAHEAD_CACHE_ENTRIES
+
+
+def test_typeahead_follows_catalog_version(monkeypatch):
+    monkeypatch.setattr(app, 'db_cursor', fake_cursor)
+    app.lookup_products('serum', 10)
+    misses = app.product_typeahead_cache.misses
+    app.lookup_products('serum', 10)
+    assert app.product_typeahead_cache.misses == misses
+
+    app.products_changed()
+    app.lookup_products('serum', 10)
+    assert app.product_typeahead_cache.misses == misses + 1
+
+
+def test_eviction_keeps_recently_read_entries():
+    cache = app.CatalogCache('lru', app.LocalVersionBackend(), max_entries=3)
+    for key in 'abc':
+        cache.get(key, lambda: key)
+    cache.get('a', lambda: 'reloaded')
+    cache.get('d', lambda: 'd')
+
+    assert 'a' in cache.entries
+    assert 'b' not in cache.entries
@@ -0,0 +1,108 @@
+"""Check with EXPLAIN that the hot queries in app.py use their indexes.
+
+Refreshes the table statistics with ANALYZE TABLE, then runs EXPLAIN on
+each query in CHECKS and requires the index the optimizer actually chose
+to be one of the expected ones. On tables with only a handful of rows the
+optimizer rightly prefers a full scan, so run this against a seeded
+database (python seed_data.py) rather than an empty one. Needs the
+database from .env; exits 1 if any plan does not use its index.
+
+Usage: python verify_indexes.py
+"""
+
+import mysql.connector
+import os
+import sys
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+db_config = {
+    "host": os.environ.get('DB_HOST', "127.0.0.1"),
+    "user": os.environ.get('DB_USER', "root"),
+    "password": os.environ.get('DB_PASSWORD', "123"),
+    "database": os.environ.get('DB_NAME', "skincare_shop")
+}
+
+start = datetime(2025, 1, 1)
+
+# Below this many rows a full scan can be the optimizer's best plan
+MIN_ROWS = 1000
+
+# Hot queries from app.py and the index each one must be able to use.
+# Each entry: (description, table alias in EXPLAIN, acceptable keys, sql, params)
+CHECKS = [
+    ("orders page ordered by date", 'o', {'idx_orders_date_id'},
+     "SELECT o.id FROM orders o ORDER BY o.order_date DESC, o.id DESC LIMIT 51", ()),
+    ("orders date range filter", 'o', {'idx_orders_date_id'},
+     "SELECT o.id FROM orders o WHERE o.order_date >= %s AND o.order_date < %s "
+     "ORDER BY o.order_date DESC, o.id DESC LIMIT 51",
+     (start, start + timedelta(days=31))),
+    ("orders keyset page", 'o', {'idx_orders_date_id'},
+     "SELECT o.id FROM orders o WHERE (o.order_date < %s OR (o.order_date = %s AND o.id < %s)) "
+     "ORDER BY o.order_date DESC, o.id DESC LIMIT 51",
+     (start, start, 1000)),
+    ("orders filtered by customer", 'o', {'idx_orders_customer_date'},
+     "SELECT o.id FROM orders o WHERE o.customer_id = %s ORDER BY o.order_date DESC LIMIT 51", (1,)),
+    ("order code prefix search", 'o', {'idx_orders_code'},
+     "SELECT o.id FROM orders o WHERE o.code LIKE %s", ('ORD-A%',)),
+    ("items of displayed orders", 'oi', {'idx_order_items_order_product'},
+     "SELECT oi.id FROM order_items oi WHERE oi.order_id IN (1, 2, 3)", ()),
+    ("customer phone lookup", 'c', {'idx_customers_phone'},
+     "SELECT c.id FROM customers c WHERE c.phone = %s", ('012345678',)),
+    ("customer name prefix", 'c', {'idx_customers_full_name'},
+     "SELECT c.id FROM customers c WHERE c.full_name LIKE %s", ('An%',)),
+    ("products by category sorted by name", 'p', {'idx_products_category_name'},
+     "SELECT p.id FROM products p WHERE p.category = %s ORDER BY p.name, p.id LIMIT 25", ('Toner',)),
+    ("products sorted by name", 'p', {'idx_products_name'},
+     "SELECT p.id, p.name FROM products p ORDER BY p.name, p.id LIMIT 25", ()),
+]
+
+def verify_indexes():
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    failures = 0
+
+    try:
+        small = []
+        for table in sorted({sql.split(' FROM ')[1].split()[0] for _, _, _, sql, _ in CHECKS}):
+            # Plans are only as good as the statistics they are based on
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+            cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+            rows = cursor.fetchone()['n']
+            if rows < MIN_ROWS:
+                small.append(f"{table} ({rows} rows)")
+        if small:
+            print(f"Warning: few rows in {', '.join(small)}; a full scan may win there. "
+                  f"Seed the database first: python seed_data.py --scale small\n")
+
+        for description, alias, keys, sql, params in CHECKS:
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = [row for row in cursor.fetchall() if row['table'] == alias]
+            used = plan[0]['key'] if plan else None
+            possible = plan[0]['possible_keys'] if plan else None
+            # Only the index actually chosen counts; being merely considered
+            # is exactly the plan this script exists to catch
+            ok = used in keys
+            status = "OK  " if ok else "FAIL"
+            print(f"{status} {description}: key={used} possible={possible}")
+            if not ok:
+                failures += 1
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        failures += 1
+    finally:
+        cursor.close()
+        conn.close()
+
+    if failures:
+        print(f"\n{failures} query plan(s) do not use the expected index. Run migrate.py.")
+    else:
+        print("\nAll hot queries use their indexes.")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_indexes() else 1)